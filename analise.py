@@ -0,0 +1,215 @@
+import numpy as np
+import pandas as pd
+
+from horas_extras import filtrar_rollup, horas_anuais, horas_por_mes, janela_anos
+
+# Cálculos das páginas, sem dependência do Streamlit: as páginas chamam estas funções (através do
+# cache de resultados) e o gerador de relatórios (relatorios.py) as usa para produzir os arquivos.
+# As tabelas retornadas são numéricas; a formatação fica a cargo de quem as exibe.
+
+# Nomes curtos dos meses
+MESES = {
+    1: "jan", 2: "fev", 3: "mar", 4: "abr", 5: "mai", 6: "jun",
+    7: "jul", 8: "ago", 9: "set", 10: "out", 11: "nov", 12: "dez"
+}
+
+
+# Indicadores calculados para cada entidade a partir da sua série anual
+COLUNAS_INDICADORES = ['Variação', 'Oscilação', 'Pico', 'Ano_Pico', 'Vale', 'Ano_Vale', 'Crescimento_Anual']
+
+
+# Função para calcular, em uma única passagem vetorizada sobre a matriz (entidade x ano), os indicadores
+# de cada linha. A matriz deve ter uma coluna para cada ano do intervalo (como as do cubo), de modo que
+# a primeira e a última colunas são sempre o ano inicial e o ano final.
+#   Variação: ano final - ano inicial
+#   Oscilação: ano final - pico do intervalo (0 quando o ano final é o pico)
+#   Pico / Vale: maior e menor quantitativo no intervalo e o primeiro ano em que ocorrem
+#   Crescimento_Anual: taxa de crescimento anual composta, em % (vazia se o ano inicial for zero)
+def calcular_indicadores(matriz, anos):
+    matriz = np.asarray(matriz)
+    if matriz.shape[1] == 0:
+        return pd.DataFrame(np.nan, index=range(len(matriz)), columns=COLUNAS_INDICADORES)
+
+    linhas = np.arange(len(matriz))
+    inicial, final = matriz[:, 0], matriz[:, -1]
+    posicao_pico, posicao_vale = matriz.argmax(axis=1), matriz.argmin(axis=1)
+    pico, vale = matriz[linhas, posicao_pico], matriz[linhas, posicao_vale]
+
+    periodos = len(anos) - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crescimento = (np.power(final / inicial, 1 / periodos) - 1) * 100 if periodos else np.zeros(len(matriz))
+    crescimento = np.where(inicial > 0, crescimento, np.nan)
+
+    return pd.DataFrame({
+        'Variação': final - inicial,
+        'Oscilação': final - pico,
+        'Pico': pico,
+        'Ano_Pico': np.asarray(anos)[posicao_pico],
+        'Vale': vale,
+        'Ano_Vale': np.asarray(anos)[posicao_vale],
+        'Crescimento_Anual': crescimento,
+    })
+
+
+# Função para montar a tabela com as colunas das entidades, uma coluna por ano e os indicadores
+def tabela_indicadores(entidades, matriz, anos):
+    anos_df = pd.DataFrame(matriz, columns=pd.Index(anos, name='Ano'))
+    return pd.concat([entidades.reset_index(drop=True), anos_df, calcular_indicadores(matriz, anos)], axis=1)
+
+
+# Quantitativo por Secretaria ou por Cargo no intervalo de anos, com os indicadores
+def variacao_oscilacao(cubo, ano_inicial, ano_final, nivel='Secretaria'):
+    indice, matriz, anos = cubo.matriz(nivel, None, ano_inicial, ano_final)
+    return tabela_indicadores(indice.to_frame(index=False), matriz, anos)
+
+
+# Quadro funcional das secretarias selecionadas, com os indicadores e a linha 'Total'.
+# Os indicadores da linha 'Total' são calculados sobre a soma anual (e não somando os indicadores).
+def panorama_secretaria(cubo, secretarias, ano_inicial, ano_final):
+    indice, matriz, anos = cubo.matriz('Cargo', secretarias, ano_inicial, ano_final)
+    entidades = pd.concat([indice.to_frame(index=False), _linha_total()], ignore_index=True)
+    return tabela_indicadores(entidades, np.vstack([matriz, matriz.sum(axis=0, keepdims=True)]), anos)
+
+
+# Quadro funcional de todas as secretarias de uma só vez, como um gerador de (secretaria, tabela).
+# O cubo é fatiado uma única vez e os indicadores de todas as linhas (e dos totais de cada secretaria)
+# são calculados em uma só passagem; cada tabela gerada é igual a panorama_secretaria(cubo, [secretaria], ...).
+def panoramas_secretarias(cubo, ano_inicial, ano_final):
+    fatia = cubo._fatia_anos(ano_inicial, ano_final)
+    anos = cubo.anos[fatia]
+    contagens = cubo.contagens[:, :, fatia]
+    posicoes_secretarias, posicoes_cargos = np.nonzero(contagens.sum(axis=2) > 0)
+    com_servidores = np.unique(posicoes_secretarias)
+
+    entidades = cubo.cargos[posicoes_cargos].to_frame(index=False)
+    entidades.insert(0, 'Secretaria', cubo.secretarias[posicoes_secretarias])
+    totais = _linha_total(len(com_servidores))
+    totais.insert(0, 'Secretaria', cubo.secretarias[com_servidores])
+    matriz = np.vstack([contagens[posicoes_secretarias, posicoes_cargos], contagens[com_servidores].sum(axis=1)])
+    tabela = tabela_indicadores(pd.concat([entidades, totais], ignore_index=True), matriz, anos)
+
+    # Reunir as linhas de cada secretaria, com a linha 'Total' ao final
+    ordem = np.argsort(np.concatenate([posicoes_secretarias, com_servidores]), kind='stable')
+    for secretaria, linhas in tabela.iloc[ordem].groupby('Secretaria', sort=False):
+        yield secretaria, linhas.drop(columns='Secretaria').reset_index(drop=True)
+
+
+# Função para montar as colunas de cargo da(s) linha(s) 'Total'
+def _linha_total(quantidade=1):
+    return pd.DataFrame({'Cargo': ['Total'] * quantidade, 'Descrição_Cargo': [''] * quantidade})
+
+
+# Tabelas da secretaria selecionada em app.py: quantitativo por descrição do cargo e ano (gráfico)
+# e dados detalhados dos cargos, ordenados pelo total de servidores, com a linha de totais ao final
+def tabelas_secretaria(cubo, secretaria, ano_inicial, ano_final):
+    # Fatiar o cubo para a secretaria selecionada e dentro do intervalo de anos
+    quantitativo_cargos = cubo.por_cargo([secretaria], ano_inicial, ano_final)
+
+    # Renomear as colunas e manter apenas os anos com servidores na secretaria
+    quantitativo_cargos = quantitativo_cargos.rename(columns={'Cargo': 'Código', 'Descrição_Cargo': 'Descrição'})
+    anos_com_dados = [ano for ano in quantitativo_cargos.columns[2:] if quantitativo_cargos[ano].sum() > 0]
+    quantitativo_cargos = quantitativo_cargos[['Descrição', 'Código'] + anos_com_dados]
+
+    # Quantitativo por descrição do cargo e ano, usado no gráfico de barras
+    cargo_ano_df = quantitativo_cargos.groupby('Descrição')[anos_com_dados].sum().T
+
+    # Agrupar por cargo e ano dentro da secretaria selecionada e no intervalo de anos
+    dados_detalhados = quantitativo_cargos.sort_values(['Descrição', 'Código'], ignore_index=True)
+
+    # Calcular a linha de totais para as colunas dos anos
+    totais = dados_detalhados.iloc[:, 2:].sum()
+    totais_row = pd.DataFrame(totais).T
+    totais_row.insert(0, 'Descrição', 'Total')
+    totais_row.insert(1, 'Código', '')
+
+    # Adicionar a linha de totais ao DataFrame
+    dados_detalhados = pd.concat([dados_detalhados, totais_row], ignore_index=True)
+
+    # Remover o índice na última linha
+    dados_detalhados.index = dados_detalhados.index.map(str)  # Converter índice para string
+    dados_detalhados.index = dados_detalhados.index[:-1].tolist() + ['']  # Omitir o índice da última linha
+
+    # Somar as colunas de anos para ordenar as descrições com base no total ao longo dos anos
+    dados_detalhados['Total_Servidores'] = dados_detalhados.iloc[:, 2:].sum(axis=1)
+
+    # Ordenar pelo total de servidores, excluindo a linha de totais
+    dados_detalhados = pd.concat([dados_detalhados.iloc[:-1].sort_values(by='Total_Servidores', ascending=False), dados_detalhados.iloc[-1:]])
+
+    # Remover a coluna de soma usada para ordenar
+    dados_detalhados = dados_detalhados.drop(columns=['Total_Servidores'])
+
+    return cargo_ano_df, dados_detalhados
+
+
+# Horas por ano de todas as secretarias e de todos os cargos, usadas pela página "Análise Geral".
+# Não dependem do intervalo de anos: ao mudar apenas o intervalo, somente a janela é recortada.
+def horas_anuais_geral(rollup):
+    return horas_anuais(rollup, 'Secretaria'), horas_anuais(rollup, 'Cargo')
+
+
+# Tabelas da página "Análise Geral" de horas extras: tabelas completas por secretaria e por cargo
+# e os 10 valores mais altos de cada uma, usados nos gráficos. `anuais` (opcional) são as horas por
+# ano de horas_anuais_geral, já calculadas.
+def analise_geral_horas(rollup, ano_inicial, ano_final, anuais=None):
+    secretarias_anuais, cargos_anuais = anuais if anuais is not None else horas_anuais_geral(rollup)
+
+    # Manter as tabelas completas, apenas com os anos do intervalo
+    df_secretarias_pivot = janela_anos(secretarias_anuais, ano_inicial, ano_final)
+    df_top_cargos_pivot = janela_anos(cargos_anuais, ano_inicial, ano_final)
+
+    # Mostrar apenas os 10 valores mais altos para os gráficos
+    top_10_secretarias = df_secretarias_pivot.sum(axis=1).rename('Horas_realizadas').nlargest(10).reset_index()
+    top_10_cargos = df_top_cargos_pivot.sum(axis=1).rename('Horas_realizadas').nlargest(10).reset_index()
+    return df_secretarias_pivot, df_top_cargos_pivot, top_10_secretarias, top_10_cargos
+
+
+# Horas por ano de cada cargo nas secretarias selecionadas, usadas pela página "Análise por Secretaria"
+def horas_anuais_secretarias(rollup, secretarias):
+    return horas_anuais(rollup, ['Cargo', 'Cod_Cargo'], secretarias)
+
+
+# Tabelas da página "Análise por Secretaria" de horas extras: detalhamento por cargo e ano
+# nas secretarias selecionadas e os 10 cargos com mais horas, usados no gráfico. `anuais` (opcional)
+# são as horas por ano de horas_anuais_secretarias para as mesmas secretarias, já calculadas.
+def analise_secretaria_horas(rollup, secretarias, ano_inicial, ano_final, anuais=None):
+    if anuais is None:
+        anuais = horas_anuais_secretarias(rollup, secretarias)
+
+    # Tabela pivô com colunas para cada ano do intervalo
+    detalhamento_pivot = janela_anos(anuais, ano_inicial, ano_final)
+
+    # Dados do gráfico de barras (mantendo o gráfico para os 10 principais cargos)
+    top_10_grouped_data = detalhamento_pivot.sum(axis=1).rename('Horas_realizadas').reset_index()
+    top_10_grouped_data = top_10_grouped_data.sort_values(by='Horas_realizadas', ascending=False).head(10)
+    return detalhamento_pivot, top_10_grouped_data
+
+
+# Detalhamento por cargo e ano de todas as secretarias de uma só vez, como um gerador de
+# (secretaria, tabela). Um único agrupamento por (Secretaria, Cargo, Cod_Cargo, Ano) atende todas
+# as secretarias; cada tabela gerada é igual ao detalhamento de analise_secretaria_horas.
+def detalhamentos_secretarias(rollup, ano_inicial, ano_final):
+    filtrado = filtrar_rollup(rollup, ano_inicial, ano_final)
+    agrupado = filtrado.groupby(['Secretaria', 'Cargo', 'Cod_Cargo', 'Ano'], observed=True)['Horas_realizadas'].sum()
+    for secretaria, linhas in agrupado.groupby(level='Secretaria', observed=True, sort=False):
+        yield secretaria, linhas.droplevel('Secretaria').unstack('Ano').fillna(0)
+
+
+# Extrato mensal de horas realizadas de um cargo, com os meses em ordem cronológica e pelo nome curto
+def extrato_mensal_cargo(rollup, cargo):
+    # Agrupar por ano e mês e somar as horas realizadas do cargo selecionado
+    extrato = horas_por_mes(rollup, cargo)
+    return _nomear_meses(extrato)
+
+
+# Extrato mensal de todos os cargos de uma só vez, como um gerador de (cargo, tabela)
+def extratos_mensais(rollup):
+    agrupado = rollup.groupby(['Cargo', 'Ano', 'Mes'], observed=True, as_index=False)['Horas_realizadas'].sum()
+    for cargo, linhas in agrupado.groupby('Cargo', observed=True, sort=False):
+        yield cargo, _nomear_meses(linhas.drop(columns='Cargo').reset_index(drop=True))
+
+
+# Função para ordenar os meses cronologicamente e substituir os números pelos nomes correspondentes
+def _nomear_meses(extrato):
+    extrato = extrato.sort_values(['Ano', 'Mes'])
+    extrato['Mes'] = pd.Categorical(extrato['Mes'].map(MESES), categories=MESES.values(), ordered=True)
+    return extrato
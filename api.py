@@ -0,0 +1,453 @@
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import suppress
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from analise import (analise_geral_horas, analise_secretaria_horas, extrato_mensal_cargo, horas_anuais_geral,
+                     horas_anuais_secretarias, panorama_secretaria, variacao_oscilacao)
+from bases import BASES_SERVIDORES, obter_cubo
+from cache_resultados import CacheResultados, cache_resultados
+from dados import agregar_planilhas, trava_armazenamento
+from graficos import impressao_tabela
+from horas_extras import (COLUNAS_HORAS_EXTRAS, DIMENSOES_SERVIDORES, carregar_rollup, carregar_servidores,
+                          impressao_rollup, impressao_servidores, meses_armazenados, preparar_bloco,
+                          resumir_servidores)
+from indice_servidores import construir_indice
+from relatorios import carregar_cubo_servidores, normalizar_tabela
+
+# Serviço HTTP/JSON local com as mesmas tabelas das páginas, para que outras ferramentas consultem os
+# quantitativos e as horas extras sem ler as planilhas. Os dados são carregados uma única vez e
+# compartilhados por todos os clientes; cada resposta tem um ETag e pode ser revalidada com If-None-Match.
+# Exemplos:
+#   python api.py --base base.xlsx --porta 8765
+#   curl 'http://127.0.0.1:8765/servidores/cargos?ano_inicial=2019&secretaria=SEC01'
+
+# Respostas já serializadas (JSON e, quando vale a pena, gzip), por (versão dos dados, rota, parâmetros)
+cache_api = CacheResultados(capacidade=int(os.environ.get('SMRH_CACHE_API', 256)), nome='api')
+
+# Tamanho mínimo (bytes) de uma resposta para comprimi-la com gzip
+TAMANHO_MINIMO_GZIP = 1024
+
+# Tempo máximo (s) de espera pela próxima requisição em uma conexão mantida aberta
+TEMPO_OCIOSO = 15
+
+_logger = logging.getLogger('smrh.api')
+
+
+# Erro de uma requisição, devolvido ao cliente com o status informado
+class ErroRequisicao(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+# Conjunto de dados servido pela API: o cubo da base de servidores e os agregados de horas extras.
+# Uma base registrada é obtida de bases.py (que a recarrega se a planilha mudar) e os meses armazenados
+# de horas extras são recarregados quando o armazenamento muda; planilhas informadas são lidas uma vez.
+class DadosApi:
+    def __init__(self, bases=None, planilhas=None, aba='base', processos=None):
+        self._base_registrada = bases[0] if bases and len(bases) == 1 and bases[0] in BASES_SERVIDORES else None
+        self._cubo = carregar_cubo_servidores(bases, aba, processos) if bases and not self._base_registrada else None
+        self._trava = threading.Lock()
+
+        self._armazenados = not planilhas
+        self._impressao_armazenada = None
+        if planilhas:
+            servidores = agregar_planilhas(planilhas, DIMENSOES_SERVIDORES, 'Horas_realizadas', colunas=COLUNAS_HORAS_EXTRAS,
+                                           sheet_name=aba, preparar=preparar_bloco, processos=processos)
+            self._horas = (resumir_servidores(servidores), servidores, impressao_tabela(servidores))
+        else:
+            self.horas()
+
+    # Função para obter o cubo de servidores (None se nenhuma base foi informada)
+    def cubo(self):
+        if self._base_registrada:
+            return obter_cubo(self._base_registrada)
+        return self._cubo
+
+    # Função para obter (rollup, agregados por servidor, impressão) de horas extras. Os meses armazenados
+    # são recarregados se tiverem mudado (por exemplo, após uma incorporação feita em apphe.py).
+    def horas(self):
+        if self._armazenados:
+            impressao = f"{impressao_rollup()}|{impressao_servidores()}"
+            with self._trava:
+                if impressao != self._impressao_armazenada:
+                    # Ler sob a trava do armazenamento, para não combinar um rollup e agregados por
+                    # servidor de incorporações diferentes
+                    with trava_armazenamento():
+                        impressao = f"{impressao_rollup()}|{impressao_servidores()}"
+                        self._horas = (carregar_rollup(), carregar_servidores(), impressao)
+                    self._impressao_armazenada = impressao
+        return self._horas
+
+    # Função para descrever os dados carregados (usada na rota '/')
+    def resumo(self):
+        cubo = self.cubo()
+        rollup, servidores, _ = self.horas()
+        meses = meses_armazenados(rollup)
+        return {
+            'servidores': None if cubo is None else {
+                'anos': [int(ano) for ano in cubo.anos],
+                'secretarias': len(cubo.secretarias),
+                'cargos': len(cubo.cargos),
+            },
+            'horas_extras': None if not meses else {
+                'primeiro_mes': f"{meses[0][1]:02d}/{meses[0][0]}",
+                'ultimo_mes': f"{meses[-1][1]:02d}/{meses[-1][0]}",
+                'meses': len(meses),
+                'por_servidor': not servidores.empty,
+            },
+        }
+
+
+# Função para obter um parâmetro inteiro da consulta (ou o valor padrão)
+def _inteiro(parametros, nome, padrao=None):
+    if nome not in parametros:
+        return padrao
+    try:
+        return int(parametros[nome][-1])
+    except ValueError:
+        raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f"O parâmetro '{nome}' deve ser um número inteiro.")
+
+
+# Função para obter um parâmetro de texto da consulta (ou None)
+def _texto(parametros, nome, obrigatorio=False):
+    if nome not in parametros:
+        if obrigatorio:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f"Informe o parâmetro '{nome}'.")
+        return None
+    return parametros[nome][-1]
+
+
+# Função para obter o intervalo de anos da consulta (padrão: todos os anos disponíveis)
+def _intervalo(parametros, anos):
+    return _inteiro(parametros, 'ano_inicial', int(min(anos))), _inteiro(parametros, 'ano_final', int(max(anos)))
+
+
+# Função para obter o cubo de servidores ou recusar a requisição se nenhuma base foi carregada
+def _cubo(dados):
+    cubo = dados.cubo()
+    if cubo is None:
+        raise ErroRequisicao(HTTPStatus.NOT_FOUND, 'Nenhuma base de servidores carregada.')
+    return cubo
+
+
+# Função para obter os agregados de horas extras ou recusar a requisição se não houver nenhum mês
+def _horas(dados):
+    rollup, servidores, impressao = dados.horas()
+    if rollup.empty:
+        raise ErroRequisicao(HTTPStatus.NOT_FOUND, 'Nenhum mês de horas extras armazenado.')
+    return rollup, servidores, impressao
+
+
+# Cada rota recebe (dados, parâmetros) e retorna (versão dos dados, função que calcula a tabela).
+# A versão entra no ETag, de modo que uma revalidação é respondida sem calcular a tabela.
+
+# Quantitativo e indicadores por secretaria
+def rota_servidores_secretarias(dados, parametros):
+    cubo = _cubo(dados)
+    ano_inicial, ano_final = _intervalo(parametros, cubo.anos)
+    return cubo.impressao, lambda: variacao_oscilacao(cubo, ano_inicial, ano_final, 'Secretaria')
+
+
+# Quantitativo e indicadores por cargo (com a linha 'Total' quando há secretarias selecionadas)
+def rota_servidores_cargos(dados, parametros):
+    cubo = _cubo(dados)
+    ano_inicial, ano_final = _intervalo(parametros, cubo.anos)
+    secretarias = parametros.get('secretaria')
+    if secretarias:
+        return cubo.impressao, lambda: panorama_secretaria(cubo, secretarias, ano_inicial, ano_final)
+    return cubo.impressao, lambda: variacao_oscilacao(cubo, ano_inicial, ano_final, 'Cargo')
+
+
+# Total de servidores por ano
+def rota_servidores_anos(dados, parametros):
+    cubo = _cubo(dados)
+    ano_inicial, ano_final = _intervalo(parametros, cubo.anos)
+    secretarias = parametros.get('secretaria')
+    return cubo.impressao, lambda: cubo.total_por_ano(secretarias, ano_inicial, ano_final).rename('Quantidade').reset_index()
+
+
+# Horas realizadas por secretaria e ano
+def rota_horas_secretarias(dados, parametros):
+    rollup, _, impressao = _horas(dados)
+    ano_inicial, ano_final = _intervalo(parametros, rollup['Ano'])
+
+    def calcular():
+        anuais = cache_resultados.obter((impressao, 'he_anuais_geral', None), lambda: horas_anuais_geral(rollup))
+        return analise_geral_horas(rollup, ano_inicial, ano_final, anuais)[0]
+    return impressao, calcular
+
+
+# Horas realizadas por cargo e ano (nas secretarias selecionadas, se informadas)
+def rota_horas_cargos(dados, parametros):
+    rollup, _, impressao = _horas(dados)
+    ano_inicial, ano_final = _intervalo(parametros, rollup['Ano'])
+    secretarias = parametros.get('secretaria')
+
+    def calcular():
+        if secretarias:
+            anuais = cache_resultados.obter((impressao, 'he_anuais_secretarias', tuple(sorted(secretarias))),
+                                            lambda: horas_anuais_secretarias(rollup, secretarias))
+            return analise_secretaria_horas(rollup, secretarias, ano_inicial, ano_final, anuais)[0]
+        anuais = cache_resultados.obter((impressao, 'he_anuais_geral', None), lambda: horas_anuais_geral(rollup))
+        return analise_geral_horas(rollup, ano_inicial, ano_final, anuais)[1]
+    return impressao, calcular
+
+
+# Extrato mensal de horas realizadas de um cargo
+def rota_horas_meses(dados, parametros):
+    rollup, _, impressao = _horas(dados)
+    cargo = _texto(parametros, 'cargo', obrigatorio=True)
+    return impressao, lambda: extrato_mensal_cargo(rollup, cargo)
+
+
+# Função para obter o índice por servidor ou recusar a requisição se não houver agregados por servidor
+def _indice_servidores(dados):
+    _, servidores, impressao = _horas(dados)
+    if servidores.empty:
+        raise ErroRequisicao(HTTPStatus.NOT_FOUND, 'Os meses armazenados não têm o detalhamento por servidor.')
+    return impressao, cache_resultados.obter((impressao, 'he_indice_servidores', None), lambda: construir_indice(servidores))
+
+
+# Servidores com mais horas extras
+def rota_horas_servidores(dados, parametros):
+    impressao, indice = _indice_servidores(dados)
+    k = _inteiro(parametros, 'k', 10)
+    if not 1 <= k <= 1000:
+        raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "O parâmetro 'k' deve estar entre 1 e 1000.")
+    secretarias = parametros.get('secretaria')
+    cargo = _texto(parametros, 'cargo')
+    ano_inicial, ano_final = _intervalo(parametros, indice.colunas['Ano'])
+    if cargo is not None and cargo not in indice.cargos.get_level_values('Cargo'):
+        raise ErroRequisicao(HTTPStatus.NOT_FOUND, f"Cargo '{cargo}' não encontrado.")
+    return impressao, lambda: indice.ranking(k, secretarias, cargo, ano_inicial, ano_final)
+
+
+# Histórico mensal de um servidor
+def rota_horas_historico(dados, parametros):
+    impressao, indice = _indice_servidores(dados)
+    matricula = _texto(parametros, 'matricula', obrigatorio=True)
+    matricula = int(matricula) if matricula.isdigit() and indice.matriculas.dtype.kind in 'iu' else matricula
+    return impressao, lambda: indice.historico(matricula)
+
+
+# Rotas disponíveis: caminho -> (função, descrição)
+ROTAS = {
+    '/servidores/secretarias': (rota_servidores_secretarias, 'quantitativo e indicadores por secretaria (ano_inicial, ano_final)'),
+    '/servidores/cargos': (rota_servidores_cargos, 'quantitativo e indicadores por cargo (ano_inicial, ano_final, secretaria*)'),
+    '/servidores/anos': (rota_servidores_anos, 'total de servidores por ano (ano_inicial, ano_final, secretaria*)'),
+    '/horas-extras/secretarias': (rota_horas_secretarias, 'horas por secretaria e ano (ano_inicial, ano_final)'),
+    '/horas-extras/cargos': (rota_horas_cargos, 'horas por cargo e ano (ano_inicial, ano_final, secretaria*)'),
+    '/horas-extras/meses': (rota_horas_meses, 'extrato mensal de um cargo (cargo)'),
+    '/horas-extras/servidores': (rota_horas_servidores, 'servidores com mais horas (k, secretaria*, cargo, ano_inicial, ano_final)'),
+    '/horas-extras/historico': (rota_horas_historico, 'histórico mensal de um servidor (matricula)'),
+}
+
+
+# Função para serializar uma tabela em JSON (uma lista de objetos, um por linha) e, se for grande,
+# também comprimida com gzip
+def serializar_tabela(tabela):
+    corpo = normalizar_tabela(tabela).to_json(orient='records', force_ascii=False).encode('utf-8')
+    return corpo, gzip.compress(corpo, compresslevel=6) if len(corpo) >= TAMANHO_MINIMO_GZIP else None
+
+
+# Função para verificar se o ETag atual está entre os informados em If-None-Match
+def _etag_confere(if_none_match, etag):
+    if not if_none_match:
+        return False
+    informados = [valor.strip() for valor in if_none_match.split(',')]
+    return '*' in informados or etag in informados or etag.removeprefix('W/') in informados
+
+
+# Função para verificar se o cliente aceita gzip (Accept-Encoding), respeitando os pesos: 'gzip;q=0'
+# recusa o gzip, e um 'gzip' explícito prevalece sobre '*'
+def _aceita_gzip(accept_encoding):
+    pesos = {}
+    for item in accept_encoding.split(','):
+        codificacao, *parametros = [parte.strip() for parte in item.split(';')]
+        peso = 1.0
+        for parametro in parametros:
+            nome, _, valor = parametro.partition('=')
+            if nome.strip().lower() == 'q':
+                try:
+                    peso = float(valor)
+                except ValueError:
+                    peso = 0.0
+        if codificacao:
+            pesos[codificacao.lower()] = peso
+    return pesos.get('gzip', pesos.get('x-gzip', pesos.get('*', 0.0))) > 0
+
+
+# Servidor HTTP/1.1 assíncrono: cada conexão pode fazer várias requisições (keep-alive) e as tabelas
+# são calculadas em threads, sem bloquear os demais clientes. Requisições iguais feitas ao mesmo tempo
+# aguardam um único cálculo.
+class ServidorApi:
+    def __init__(self, dados):
+        self.dados = dados
+        self._pendentes = {}  # chave -> asyncio.Future com a resposta em cálculo
+
+    # Função para obter a resposta serializada da chave, calculando-a uma única vez mesmo com
+    # várias requisições simultâneas
+    async def _obter_resposta(self, chave, calcular):
+        pendente = self._pendentes.get(chave)
+        if pendente is not None:
+            return await asyncio.shield(pendente)
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendentes[chave] = futuro
+        try:
+            resposta = await asyncio.to_thread(cache_api.obter, chave, lambda: serializar_tabela(calcular()))
+            futuro.set_result(resposta)
+            return resposta
+        except Exception as erro:
+            futuro.set_exception(erro)
+            futuro.exception()  # marcar como consultada, mesmo sem outras requisições aguardando
+            raise
+        finally:
+            del self._pendentes[chave]
+
+    # Função para tratar uma requisição e retornar (status, corpo, cabeçalhos)
+    async def tratar_requisicao(self, metodo, alvo, cabecalhos):
+        if metodo not in ('GET', 'HEAD'):
+            raise ErroRequisicao(HTTPStatus.METHOD_NOT_ALLOWED, 'Apenas GET e HEAD são aceitos.')
+        url = urlsplit(alvo)
+        rota = url.path.rstrip('/') or '/'
+        parametros = parse_qs(url.query)
+
+        if rota == '/':
+            resumo = await asyncio.to_thread(self.dados.resumo)
+            resumo['rotas'] = {caminho: descricao for caminho, (_, descricao) in ROTAS.items()}
+            corpo = json.dumps(resumo, ensure_ascii=False).encode('utf-8')
+            etag = f'W/"{hashlib.sha256(corpo).hexdigest()[:32]}"'
+            if _etag_confere(cabecalhos.get('if-none-match'), etag):
+                return HTTPStatus.NOT_MODIFIED, b'', {'ETag': etag}
+            return HTTPStatus.OK, corpo, {'ETag': etag}
+
+        if rota not in ROTAS:
+            raise ErroRequisicao(HTTPStatus.NOT_FOUND, f"Rota '{rota}' não encontrada.")
+        versao, calcular = await asyncio.to_thread(ROTAS[rota][0], self.dados, parametros)
+
+        # O ETag depende apenas da versão dos dados e da consulta: a revalidação não calcula a tabela
+        chave = (versao, rota, tuple(sorted((nome, tuple(sorted(valores))) for nome, valores in parametros.items())))
+        etag = f'W/"{hashlib.sha256(repr(chave).encode("utf-8")).hexdigest()[:32]}"'
+        if _etag_confere(cabecalhos.get('if-none-match'), etag):
+            return HTTPStatus.NOT_MODIFIED, b'', {'ETag': etag}
+
+        corpo, corpo_gzip = await self._obter_resposta(chave, calcular)
+        if corpo_gzip is not None and _aceita_gzip(cabecalhos.get('accept-encoding', '')):
+            return HTTPStatus.OK, corpo_gzip, {'ETag': etag, 'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'}
+        return HTTPStatus.OK, corpo, {'ETag': etag, 'Vary': 'Accept-Encoding'}
+
+    # Função para tratar uma conexão: lê e responde requisições até o cliente encerrar, pedir
+    # 'Connection: close' ou ficar ocioso por TEMPO_OCIOSO segundos
+    async def tratar_conexao(self, leitor, escritor):
+        try:
+            while True:
+                try:
+                    linha = await asyncio.wait_for(leitor.readline(), TEMPO_OCIOSO)
+                except asyncio.TimeoutError:
+                    break
+                if not linha:
+                    break
+                # Linhas em branco antes da linha de requisição são ignoradas (RFC 9112, seção 2.2)
+                if not linha.strip():
+                    continue
+                partes = linha.decode('latin-1').split()
+                if len(partes) != 3:
+                    await self._enviar(escritor, HTTPStatus.BAD_REQUEST, _corpo_erro('Requisição inválida.'), {}, True, False)
+                    break
+                metodo, alvo, versao_http = partes
+
+                cabecalhos = {}
+                while True:
+                    linha = await leitor.readline()
+                    if linha in (b'\r\n', b'\n', b''):
+                        break
+                    nome, _, valor = linha.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                if cabecalhos.get('content-length', '').isdigit():
+                    await leitor.readexactly(int(cabecalhos['content-length']))
+
+                conexao = cabecalhos.get('connection', '').lower()
+                manter = conexao == 'keep-alive' or (versao_http == 'HTTP/1.1' and conexao != 'close')
+
+                try:
+                    status, corpo, extras = await self.tratar_requisicao(metodo, alvo, cabecalhos)
+                except ErroRequisicao as erro:
+                    status, corpo, extras = erro.status, _corpo_erro(str(erro)), {}
+                    if erro.status == HTTPStatus.METHOD_NOT_ALLOWED:
+                        extras['Allow'] = 'GET, HEAD'
+                except Exception as erro:
+                    _logger.exception('Erro ao tratar %s %s', metodo, alvo)
+                    status, corpo, extras = HTTPStatus.INTERNAL_SERVER_ERROR, _corpo_erro(str(erro)), {}
+
+                await self._enviar(escritor, status, corpo, extras, metodo != 'HEAD', manter)
+                _logger.info('%s %s %d %d', metodo, alvo, status.value, len(corpo))
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+            with suppress(ConnectionError):
+                await escritor.wait_closed()
+
+    # Função para enviar a resposta (o corpo é omitido em HEAD e em 304)
+    async def _enviar(self, escritor, status, corpo, extras, enviar_corpo, manter):
+        cabecalhos = {
+            'Content-Type': 'application/json; charset=utf-8',
+            'Content-Length': str(len(corpo)),
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive' if manter else 'close',
+            **extras,
+        }
+        linhas = [f'HTTP/1.1 {status.value} {status.phrase}'] + [f'{nome}: {valor}' for nome, valor in cabecalhos.items()]
+        escritor.write(('\r\n'.join(linhas) + '\r\n\r\n').encode('latin-1'))
+        if enviar_corpo and status != HTTPStatus.NOT_MODIFIED:
+            escritor.write(corpo)
+        await escritor.drain()
+
+
+# Função para montar o corpo JSON de um erro
+def _corpo_erro(mensagem):
+    return json.dumps({'erro': mensagem}, ensure_ascii=False).encode('utf-8')
+
+
+# Função para iniciar o servidor e atender até ser interrompido
+async def servir(dados, host, porta):
+    servidor = ServidorApi(dados)
+    async with await asyncio.start_server(servidor.tratar_conexao, host, porta) as servidor_tcp:
+        print(f"API disponível em http://{host}:{porta}/")
+        await servidor_tcp.serve_forever()
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Serviço HTTP/JSON local com os quantitativos e as horas extras das páginas.')
+    parser.add_argument('--base', nargs='*', default=['base.xlsx'],
+                        help=f"base registrada ({', '.join(BASES_SERVIDORES)}) ou caminhos de uma ou mais planilhas; "
+                             "sem valores, a API não serve a base de servidores")
+    parser.add_argument('--planilha', nargs='+', help='planilhas de horas extras (padrão: meses já armazenados)')
+    parser.add_argument('--aba', default='base', help='aba das planilhas')
+    parser.add_argument('--processos', type=int, help='processos para ler várias planilhas (padrão: número de núcleos)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=int(os.environ.get('SMRH_API_PORTA', 8765)))
+    args = parser.parse_args(argumentos)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    dados = DadosApi(args.base, args.planilha, args.aba, args.processos)
+    try:
+        asyncio.run(servir(dados, args.host, args.porta))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
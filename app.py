@@ -1,48 +1,24 @@
 import streamlit as st
-import pandas as pd
 import matplotlib.pyplot as plt
 
-# Título da aplicação
-st.title('Quantitativos de Servidores por Secretaria')
-
-# Carregar os dados do arquivo Excel (base.xlsx)
-base_df = pd.read_excel("base.xlsx", sheet_name='base')
-
-# Criar um container para as seleções, exibindo lado a lado
-st.subheader('Selecione os Parâmetros')
-col1, col2, col3 = st.columns(3)
+from analise import tabelas_secretaria
+from bases import BASES_SERVIDORES, obter_cubo
+from cache_resultados import cache_resultados, resumo_cache
+from cubo import comparar_cubos
+from graficos import cache_graficos, grafico_png, impressao_tabela
+from instrumentacao import etapa, exibir_painel, finalizar_execucao, iniciar_execucao
+from tabelas import exibir_tabela_paginada
 
-with col1:
-    # Selecionar uma secretaria e organizar em ordem alfabética, sem seleção inicial
-    secretarias = sorted(base_df['Secretaria'].unique().tolist())
-    selected_secretaria = st.selectbox("Escolha uma Secretaria:", ["Nenhuma"] + secretarias)
+# Iniciar a medição desta execução (apenas com SMRH_INSTRUMENTACAO=1)
+iniciar_execucao('app')
 
-with col2:
-    # Selecionar o ano inicial
-    anos = sorted(base_df['Ano'].unique())
-    ano_inicial = st.selectbox("Ano Inicial:", anos, index=0)
-
-with col3:
-    # Selecionar o ano final
-    ano_final = st.selectbox("Ano Final:", anos, index=len(anos) - 1)
-
-# Verificar se uma secretaria foi selecionada
-if selected_secretaria != "Nenhuma":
-    # Filtrar os dados para a secretaria selecionada e dentro do intervalo de anos
-    filtered_df = base_df[
-        (base_df['Secretaria'] == selected_secretaria) &
-        (base_df['Ano'] >= ano_inicial) &
-        (base_df['Ano'] <= ano_final)
-    ]
-
-    # Renomear as colunas antes de agrupar
-    filtered_df = filtered_df.rename(columns={'Cargo': 'Código', 'Descrição_Cargo': 'Descrição'})
+# Título da aplicação
+st.title('Quantitativos de Servidores por Secretaria')
 
-    # Plotar o gráfico de barras agrupadas dentro da secretaria selecionada e intervalo de anos
-    st.subheader(f'Quantidade de Servidores na {selected_secretaria} ({ano_inicial}-{ano_final})')
+# Função para desenhar o gráfico de barras empilhadas do quantitativo por cargo e ano
+def desenhar_grafico_secretaria(cargo_ano_df):
     fig, ax = plt.subplots(figsize=(12, 8))
-    cargo_ano_df = filtered_df.groupby(['Ano', 'Descrição']).size().unstack(fill_value=0)
-    bars = cargo_ano_df.plot(kind='bar', stacked=True, ax=ax)  # Barras agrupadas e empilhadas
+    cargo_ano_df.plot(kind='bar', stacked=True, ax=ax)  # Barras agrupadas e empilhadas
 
     # Adicionar o somatório no rótulo de cada barra
     total_por_ano = cargo_ano_df.sum(axis=1)
@@ -54,44 +30,121 @@ if selected_secretaria != "Nenhuma":
     ax.set_xlabel('ANOS', fontsize=12)  # Etiqueta do eixo x com tamanho maior
     ax.set_ylabel('')  # Omitir o eixo y
     ax.legend(title='LEGENDA', bbox_to_anchor=(0.5, -0.2), loc='upper center', ncol=4, fontsize=12) #Legenda na parte debaixo
-    #ax.legend(title='LEGENDA', bbox_to_anchor=(0.5, -0.2), loc='upper center', ncol=4, fontsize=12)  
 
     # Aumentar o tamanho dos rótulos dos eixos
     ax.tick_params(axis='x', labelsize=12)
     ax.tick_params(axis='y', left=False)  # Ocultar as marcações do eixo y
+    return fig
+
+# Função para exibir a comparação entre duas bases, feita sobre os cubos de quantitativos
+# (Secretaria x Cargo x Ano) de cada base, sem juntar as linhas das planilhas
+def pagina_comparacao():
+    st.subheader('Comparação entre Bases')
+    nomes_bases = list(BASES_SERVIDORES)
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        nome_a = st.selectbox("Base A:", nomes_bases, index=0)
+    with col2:
+        nome_b = st.selectbox("Base B:", nomes_bases, index=min(1, len(nomes_bases) - 1))
+    with col3:
+        nivel = st.selectbox("Comparar por:", ["Secretaria", "Cargo"])
+
+    if nome_a == nome_b:
+        st.info("Por favor, selecione duas bases diferentes para comparar.")
+        return
+
+    with st.spinner('Carregando dados...'), etapa('carregar_cubos'):
+        cubo_a = obter_cubo(nome_a)
+        cubo_b = obter_cubo(nome_b)
+
+    secretarias = st.multiselect("Secretarias (opcional):", sorted(set(cubo_a.secretarias) | set(cubo_b.secretarias)))
+
+    # Obter a comparação do cache de resultados ou calculá-la
+    with etapa('comparar_cubos'):
+        comparacao = cache_resultados.obter(
+            ((cubo_a.impressao, cubo_b.impressao), 'comparacao', (nivel, tuple(sorted(secretarias)))),
+            lambda: comparar_cubos(cubo_a, cubo_b, nivel, secretarias or None, nomes=(nome_a, nome_b)),
+        )
+
+    if comparacao.empty:
+        st.info("As bases selecionadas não têm anos em comum para comparar.")
+        return
+
+    # Tabela de diferenças por entidade e ano
+    colunas_entidade = ['Secretaria'] if nivel == 'Secretaria' else ['Cargo', 'Descrição_Cargo']
+    anos_comuns = sorted(comparacao['Ano'].unique())
+    with etapa('pivot_diferencas'):
+        diferencas = comparacao.pivot_table(index=colunas_entidade, columns='Ano', values='Diferença', aggfunc='sum', fill_value=0).reset_index()
+
+    with etapa('exibir_tabelas'):
+        st.subheader(f'Diferença no Quantitativo de Servidores ({nome_b} - {nome_a})')
+        exibir_tabela_paginada(diferencas, 'tabela_diferencas', casas=0, colunas=anos_comuns, centralizar=True)
+
+        st.subheader('Quantitativo de Servidores por Base')
+        exibir_tabela_paginada(comparacao, 'tabela_comparacao', casas=0, colunas=[nome_a, nome_b, 'Diferença'])
+
+# Selecionar o modo de visualização
+modo = st.sidebar.radio("Visualização:", ["Quantitativos por Secretaria", "Comparação entre bases"])
+
+if modo == "Comparação entre bases":
+    pagina_comparacao()
+    st.sidebar.caption(resumo_cache())
+    exibir_painel(finalizar_execucao())
+    st.stop()
+
+# Selecionar a base de dados; apenas a base escolhida é carregada (uma única vez por processo)
+nome_base = st.sidebar.selectbox("Base de dados:", list(BASES_SERVIDORES))
+
+# Carregar o cubo de quantitativos (Secretaria x Cargo x Ano) da base selecionada
+with st.spinner('Carregando dados...'), etapa('carregar_cubo'):
+    cubo = obter_cubo(nome_base)
 
-    st.pyplot(fig)
-
-    # Agrupar por cargo e ano dentro da secretaria selecionada e no intervalo de anos
-    dados_detalhados = filtered_df.groupby(['Descrição', 'Código', 'Ano']).size().unstack(fill_value=0).reset_index()
-
-    # Calcular a linha de totais para as colunas dos anos
-    totais = dados_detalhados.iloc[:, 2:].sum()
-    totais_row = pd.DataFrame(totais).T
-    totais_row.insert(0, 'Descrição', 'Total')
-    totais_row.insert(1, 'Código', '')
-
-    # Adicionar a linha de totais ao DataFrame
-    dados_detalhados = pd.concat([dados_detalhados, totais_row], ignore_index=True)
+# Criar um container para as seleções, exibindo lado a lado
+st.subheader('Selecione os Parâmetros')
+col1, col2, col3 = st.columns(3)
 
-    # Remover o índice na última linha
-    dados_detalhados.index = dados_detalhados.index.map(str)  # Converter índice para string
-    dados_detalhados.index = dados_detalhados.index[:-1].tolist() + ['']  # Omitir o índice da última linha
+with col1:
+    # Selecionar uma secretaria e organizar em ordem alfabética, sem seleção inicial
+    secretarias = cubo.secretarias.tolist()
+    selected_secretaria = st.selectbox("Escolha uma Secretaria:", ["Nenhuma"] + secretarias)
 
-    # Somar as colunas de anos para ordenar as descrições com base no total ao longo dos anos
-    dados_detalhados['Total_Servidores'] = dados_detalhados.iloc[:, 2:].sum(axis=1)
+with col2:
+    # Selecionar o ano inicial
+    anos = cubo.anos.tolist()
+    ano_inicial = st.selectbox("Ano Inicial:", anos, index=0)
 
-    # Ordenar pelo total de servidores, excluindo a linha de totais
-    dados_detalhados = pd.concat([dados_detalhados.iloc[:-1].sort_values(by='Total_Servidores', ascending=False), dados_detalhados.iloc[-1:]])
+with col3:
+    # Selecionar o ano final
+    ano_final = st.selectbox("Ano Final:", anos, index=len(anos) - 1)
 
-    # Remover a coluna de soma usada para ordenar
-    dados_detalhados = dados_detalhados.drop(columns=['Total_Servidores'])
+# Verificar se uma secretaria foi selecionada
+if selected_secretaria != "Nenhuma":
+    # Obter as tabelas do cache de resultados, compartilhado entre sessões, ou calculá-las
+    with etapa('tabelas_secretaria'):
+        cargo_ano_df, dados_detalhados = cache_resultados.obter(
+            (cubo.impressao, 'secretaria', (selected_secretaria, ano_inicial, ano_final)),
+            lambda: tabelas_secretaria(cubo, selected_secretaria, ano_inicial, ano_final),
+        )
 
-    # Formatar números na tabela com separador de milhar
-    dados_detalhados = dados_detalhados.applymap(lambda x: f"{x:,.0f}".replace(',', '.') if isinstance(x, (int, float)) else x)
+    # Plotar o gráfico de barras agrupadas dentro da secretaria selecionada e intervalo de anos
+    # (a imagem é desenhada uma única vez por tabela e reaproveitada do cache de gráficos)
+    st.subheader(f'Quantidade de Servidores na {selected_secretaria} ({ano_inicial}-{ano_final})')
+    with etapa('grafico_barras'):
+        imagem = grafico_png((impressao_tabela(cargo_ano_df), 'barras_secretaria'), lambda: desenhar_grafico_secretaria(cargo_ano_df))
+        st.image(imagem, use_container_width=True)
 
     # Exibir os dados detalhados em uma tabela
     st.subheader(f'Dados Detalhados dos Cargos lotados na: {selected_secretaria} ({ano_inicial}-{ano_final})')
-    st.dataframe(dados_detalhados.style.set_properties(**{'text-align': 'center'}))
+    # Exibir apenas a página atual, formatada com separador de milhar (a tabela em cache continua numérica)
+    with etapa('exibir_tabela'):
+        exibir_tabela_paginada(dados_detalhados, 'tabela_detalhada', casas=0, centralizar=True, linha_total=True)
 else:
-    st.info("Por favor, selecione uma Secretaria para visualizar os dados.")
\ No newline at end of file
+    st.info("Por favor, selecione uma Secretaria para visualizar os dados.")
+
+# Exibir os contadores do cache de resultados e do cache de gráficos
+st.sidebar.caption(resumo_cache())
+st.sidebar.caption(resumo_cache(cache_graficos, 'Cache de gráficos'))
+
+# Exibir o painel de desempenho desta execução (apenas com a instrumentação ativada)
+exibir_painel(finalizar_execucao())
\ No newline at end of file
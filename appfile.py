@@ -1,31 +1,58 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 
+from analise import panorama_secretaria, variacao_oscilacao
+from cache_resultados import cache_resultados, resumo_cache
+from cubo import construir_cubo
+from dados import agregar_envios
+from graficos import cache_graficos, grafico_plotly, impressao_tabela
+from instrumentacao import etapa, exibir_painel, finalizar_execucao, iniciar_execucao
+from tabelas import exibir_tabela_paginada
+
+# Iniciar a medição desta execução (apenas com SMRH_INSTRUMENTACAO=1)
+iniciar_execucao('appfile')
+
 # Configurar a sidebar para navegação entre as páginas
 st.sidebar.title("Navegação")
 pagina_selecionada = st.sidebar.radio("Escolha a página", ["Análise Geral", "Análise por Cargo", "Análise por Secretaria"])
 
-# Função para carregar o arquivo Excel com cache para melhorar performance
-@st.cache_data
-def carregar_dados(uploaded_file):
+# Colunas da base usadas pelas páginas
+COLUNAS_QUANTITATIVO = ['Secretaria', 'Cargo', 'Descrição_Cargo', 'Ano']
+
+# Função para carregar os arquivos Excel em blocos e construir o cubo de quantitativos
+# (Secretaria x Cargo x Ano) uma única vez por conjunto de arquivos, sem manter todas as linhas em memória.
+# Vários arquivos (por exemplo, um por ano) são lidos em paralelo e os seus quantitativos somados.
+# Os quantitativos de cada arquivo ficam armazenados em disco pelo hash do conteúdo: o mesmo arquivo
+# enviado de novo (por outro usuário ou após reiniciar o servidor) não é lido outra vez.
+# O cubo é um recurso compartilhado (st.cache_resource): as execuções recebem o mesmo objeto, sem
+# serializar e copiar o array a cada execução, e não o alteram (as contagens são somente leitura).
+@st.cache_resource
+def carregar_cubo(uploaded_files):
     try:
-        df = pd.read_excel(uploaded_file, sheet_name='base')
-        return df
+        contagens = agregar_envios(uploaded_files, COLUNAS_QUANTITATIVO, colunas=COLUNAS_QUANTITATIVO)
+        return construir_cubo(contagens, coluna_quantidade='Quantidade')
+    except KeyError as e:
+        st.error(f"{e.args[0]}. Verifique o arquivo.")
+        return None
     except Exception as e:
         st.error(f"Ocorreu um erro ao carregar o arquivo: {e}")
         return None
 
-# Função genérica para calcular Variação e Oscilação, utilizada em diferentes páginas
-def calcular_variacao_oscilacao_generica(df, ano_inicial, ano_final, group_by_cols):
-    df_agrupado = df.groupby(group_by_cols + ['Ano']).size().unstack(fill_value=0).reset_index()
-    df_agrupado['Variação'] = df_agrupado[ano_final] - df_agrupado[ano_inicial]
-    df_agrupado['Oscilação'] = df_agrupado[ano_final] - df_agrupado.iloc[:, 2:].max(axis=1)
-    return df_agrupado
-
-# Função para selecionar anos e filtrar dados
-def filtrar_dados(df):
-    anos = sorted(df['Ano'].unique())
+# Função genérica para calcular Variação, Oscilação e demais indicadores, utilizada em diferentes páginas
+# (o resultado fica no cache de resultados, compartilhado entre sessões)
+def calcular_variacao_oscilacao_generica(cubo, ano_inicial, ano_final, group_by_cols):
+    nivel = 'Secretaria' if group_by_cols == ['Secretaria'] else 'Cargo'
+    chave = (cubo.impressao, 'variacao_oscilacao', (tuple(group_by_cols), ano_inicial, ano_final))
+    return cache_resultados.obter(chave, lambda: variacao_oscilacao(cubo, ano_inicial, ano_final, nivel))
+
+# Função para calcular o quadro funcional das secretarias selecionadas, com os indicadores e linha de soma
+def calcular_panorama_secretaria(cubo, secretarias, ano_inicial, ano_final):
+    chave = (cubo.impressao, 'secretaria', (tuple(sorted(secretarias)), ano_inicial, ano_final))
+    return cache_resultados.obter(chave, lambda: panorama_secretaria(cubo, secretarias, ano_inicial, ano_final))
+
+# Função para selecionar o intervalo de anos
+def filtrar_dados(cubo):
+    anos = cubo.anos.tolist()
     col1, col2 = st.columns(2)
     
     with col1:
@@ -33,8 +60,12 @@ def filtrar_dados(df):
     with col2:
         ano_final = st.selectbox("Ano Final:", anos, index=len(anos) - 1)
 
-    df_filtrado = df[(df['Ano'] >= ano_inicial) & (df['Ano'] <= ano_final)]
-    return df_filtrado, ano_inicial, ano_final
+    return ano_inicial, ano_final
+
+# Função para exibir uma tabela de quantitativos paginada, com o crescimento anual em % com uma casa decimal
+def exibir_tabela_indicadores(tabela, chave, linha_total=False):
+    exibir_tabela_paginada(tabela, chave, casas=1, colunas=['Crescimento_Anual'], centralizar=True,
+                           linha_total=linha_total, altura=400)
 
 # Função para exibir gráficos de Variação e Oscilação
 def exibir_graficos_variacao_oscilacao(df_agrupado, tipo_analise):
@@ -48,15 +79,20 @@ def exibir_graficos_variacao_oscilacao(df_agrupado, tipo_analise):
         titulo_variacao = "Cargos com Maiores Redução"
         titulo_oscilacao = "Oscilação Máxima"
 
-    fig_top_10_variacao = px.bar(top_10_neg_var, x='Variação', y=top_10_neg_var.columns[0],
-                                 orientation='h',
-                                 title=titulo_variacao,
-                                 labels={'Variação': 'Variação'})
-
-    fig_top_10_oscilacao = px.bar(top_10_neg_osc, x='Oscilação', y=top_10_neg_osc.columns[0],
-                                  orientation='h',
-                                  title=titulo_oscilacao,
-                                  labels={'Oscilação': 'Oscilação Máxima'})
+    # As figuras são construídas uma única vez por tabela e reaproveitadas do cache de gráficos
+    fig_top_10_variacao = grafico_plotly(
+        (impressao_tabela(top_10_neg_var), 'variacao', titulo_variacao),
+        lambda: px.bar(top_10_neg_var, x='Variação', y=top_10_neg_var.columns[0],
+                       orientation='h',
+                       title=titulo_variacao,
+                       labels={'Variação': 'Variação'}))
+
+    fig_top_10_oscilacao = grafico_plotly(
+        (impressao_tabela(top_10_neg_osc), 'oscilacao', titulo_oscilacao),
+        lambda: px.bar(top_10_neg_osc, x='Oscilação', y=top_10_neg_osc.columns[0],
+                       orientation='h',
+                       title=titulo_oscilacao,
+                       labels={'Oscilação': 'Oscilação Máxima'}))
 
     col1, col2 = st.columns(2)
     with col1:
@@ -65,31 +101,43 @@ def exibir_graficos_variacao_oscilacao(df_agrupado, tipo_analise):
         st.plotly_chart(fig_top_10_oscilacao)
 
 # Função para exibir a página "Análise Geral"
-def pagina_analise_geral(df):
+def pagina_analise_geral(cubo):
     st.title("Panorama Geral de Servidores")
 
-    df_filtrado, ano_inicial, ano_final = filtrar_dados(df)
-    panorama_geral = calcular_variacao_oscilacao_generica(df_filtrado, ano_inicial, ano_final, ['Secretaria'])
+    ano_inicial, ano_final = filtrar_dados(cubo)
+    if ano_inicial > ano_final:
+        st.warning("O ano inicial deve ser anterior ou igual ao ano final.")
+        return
+    with etapa('variacao_oscilacao'):
+        panorama_geral = calcular_variacao_oscilacao_generica(cubo, ano_inicial, ano_final, ['Secretaria'])
 
-    exibir_graficos_variacao_oscilacao(panorama_geral, 'Secretaria')
+    with etapa('graficos'):
+        exibir_graficos_variacao_oscilacao(panorama_geral, 'Secretaria')
 
-    st.subheader('Quantidades de Servidores por Secretaria')
-    st.dataframe(panorama_geral.style.set_properties(**{'text-align': 'center'}), height=400, use_container_width=True)
+    with etapa('exibir_tabela'):
+        st.subheader('Quantidades de Servidores por Secretaria')
+        exibir_tabela_indicadores(panorama_geral, 'tabela_secretarias')
 
 # Função para exibir a página "Análise por Cargo"
-def pagina_analise_cargo(df):
+def pagina_analise_cargo(cubo):
     st.title("Panorama Geral de Servidores por Cargo")
 
-    df_filtrado, ano_inicial, ano_final = filtrar_dados(df)
-    panorama_cargo = calcular_variacao_oscilacao_generica(df_filtrado, ano_inicial, ano_final, ['Cargo', 'Descrição_Cargo'])
+    ano_inicial, ano_final = filtrar_dados(cubo)
+    if ano_inicial > ano_final:
+        st.warning("O ano inicial deve ser anterior ou igual ao ano final.")
+        return
+    with etapa('variacao_oscilacao'):
+        panorama_cargo = calcular_variacao_oscilacao_generica(cubo, ano_inicial, ano_final, ['Cargo', 'Descrição_Cargo'])
 
-    exibir_graficos_variacao_oscilacao(panorama_cargo, 'Cargo')
+    with etapa('graficos'):
+        exibir_graficos_variacao_oscilacao(panorama_cargo, 'Cargo')
 
-    st.subheader('Quantidades de Servidores por Cargo')
-    st.dataframe(panorama_cargo.style.set_properties(**{'text-align': 'center'}), height=400, use_container_width=True)
+    with etapa('exibir_tabela'):
+        st.subheader('Quantidades de Servidores por Cargo')
+        exibir_tabela_indicadores(panorama_cargo, 'tabela_cargos')
 
 # Função para exibir a página "Quadro Funcional por Secretaria"
-def pagina_analise_secretaria(df):
+def pagina_analise_secretaria(cubo):
     st.title("Quadro Funcional por Secretaria")
 
     # Container com multiselect de Secretaria e seleção de anos
@@ -97,67 +145,61 @@ def pagina_analise_secretaria(df):
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            secretarias = st.multiselect("Selecione as Secretarias:", options=df['Secretaria'].unique())
+            secretarias = st.multiselect("Selecione as Secretarias:", options=cubo.secretarias.tolist())
         with col2:
-            ano_inicial = st.selectbox("Ano Inicial:", sorted(df['Ano'].unique()), index=0)
+            ano_inicial = st.selectbox("Ano Inicial:", cubo.anos.tolist(), index=0)
         with col3:
-            ano_final = st.selectbox("Ano Final:", sorted(df['Ano'].unique()), index=len(sorted(df['Ano'].unique())) - 1)
-
-    if secretarias:
-        # Filtrar os dados
-        df_filtrado = df[(df['Secretaria'].isin(secretarias)) & (df['Ano'] >= ano_inicial) & (df['Ano'] <= ano_final)]
-
-        # Verificar se as colunas 'Cargo' e 'Descrição_Cargo' estão presentes
-        if 'Cargo' in df_filtrado.columns and 'Descrição_Cargo' in df_filtrado.columns:
-            # Agrupar os dados por Cargo, Descrição_Cargo e Ano
-            panorama_secretaria = df_filtrado.groupby(['Cargo', 'Descrição_Cargo', 'Ano']).size().unstack(fill_value=0).reset_index()
-
-            # Forçar a inclusão de todas as colunas de anos mesmo que ausentes
-            all_years = list(range(ano_inicial, ano_final + 1))
-            for year in all_years:
-                if year not in panorama_secretaria.columns:
-                    panorama_secretaria[year] = 0
-
-            # Calcular Variação e Oscilação
-            panorama_secretaria['Variação'] = panorama_secretaria[ano_final] - panorama_secretaria[ano_inicial]
-            panorama_secretaria['Oscilação'] = panorama_secretaria[ano_final] - panorama_secretaria.iloc[:, 2:].max(axis=1)
-
-            # Adicionar uma linha de soma na tabela
-            sum_row = pd.DataFrame(panorama_secretaria.iloc[:, 2:].sum()).T
-            sum_row['Cargo'] = 'Total'
-            sum_row['Descrição_Cargo'] = ''
-            panorama_secretaria = pd.concat([panorama_secretaria, sum_row], ignore_index=True)
-
-            # Gráfico de Barras Agrupadas
-            fig_barras_agrupadas = px.bar(panorama_secretaria[:-1], x='Cargo', y=all_years,
-                                          title="Distribuição de Servidores por Secretaria",
-                                          labels={'value': 'Quantidade de Servidores', 'variable': 'Ano'})
+            ano_final = st.selectbox("Ano Final:", cubo.anos.tolist(), index=len(cubo.anos) - 1)
+
+    if ano_inicial > ano_final:
+        st.warning("O ano inicial deve ser anterior ou igual ao ano final.")
+    elif secretarias:
+        # Calcular o quadro funcional das secretarias selecionadas (ou obtê-lo do cache de resultados)
+        with etapa('panorama_secretaria'):
+            panorama_secretaria = calcular_panorama_secretaria(cubo, secretarias, ano_inicial, ano_final)
+        # O cubo garante uma coluna para cada ano do intervalo
+        all_years = list(range(ano_inicial, ano_final + 1))
+
+        # Gráfico de Barras Agrupadas (construído uma única vez por quadro funcional)
+        with etapa('graficos'):
+            fig_barras_agrupadas = grafico_plotly(
+                (impressao_tabela(panorama_secretaria), 'barras_secretarias'),
+                lambda: px.bar(panorama_secretaria[:-1], x='Cargo', y=all_years,
+                               title="Distribuição de Servidores por Secretaria",
+                               labels={'value': 'Quantidade de Servidores', 'variable': 'Ano'}))
 
             st.plotly_chart(fig_barras_agrupadas)
 
-            # Exibir a tabela com as contagens e variações
+        # Exibir a tabela com as contagens e variações
+        with etapa('exibir_tabela'):
             st.subheader('Distribuição de Servidores por Secretaria')
-            st.dataframe(panorama_secretaria.style.set_properties(**{'text-align': 'center'}), height=400, use_container_width=True)
-        else:
-            st.error("As colunas 'Cargo' e/ou 'Descrição_Cargo' não foram encontradas nos dados. Verifique o arquivo.")
+            exibir_tabela_indicadores(panorama_secretaria, 'tabela_secretaria', linha_total=True)
     else:
         st.warning("Selecione uma ou mais secretarias para ver as informações.")
 
-# Upload do arquivo Excel
-uploaded_file = st.sidebar.file_uploader("Faça o upload da base de dados (.xlsx)", type=["xlsx"], help="Arraste e solte o arquivo aqui ou clique para selecionar.")
+# Upload dos arquivos Excel
+uploaded_files = st.sidebar.file_uploader("Faça o upload da base de dados (.xlsx)", type=["xlsx"], accept_multiple_files=True,
+                                          help="Arraste e solte os arquivos aqui ou clique para selecionar. Vários arquivos são combinados em uma única base.")
 
-# Carregar os dados se o arquivo foi enviado
-if uploaded_file is not None:
-    with st.spinner('Carregando dados...'):
-        df = carregar_dados(uploaded_file)
+# Carregar os dados se algum arquivo foi enviado
+if uploaded_files:
+    with st.spinner('Carregando dados...'), etapa('carregar_cubo'):
+        cubo = carregar_cubo(uploaded_files)
 
-    if df is not None:
+    if cubo is not None:
         # Verificar qual página foi selecionada e chamar a função correspondente
         if pagina_selecionada == "Análise Geral":
-            pagina_analise_geral(df)
+            pagina_analise_geral(cubo)
         elif pagina_selecionada == "Análise por Cargo":
-            pagina_analise_cargo(df)
+            pagina_analise_cargo(cubo)
         elif pagina_selecionada == "Análise por Secretaria":
-            pagina_analise_secretaria(df)
+            pagina_analise_secretaria(cubo)
+
+    # Exibir os contadores do cache de resultados e do cache de gráficos
+    st.sidebar.caption(resumo_cache())
+    st.sidebar.caption(resumo_cache(cache_graficos, 'Cache de gráficos'))
 else:
     st.sidebar.warning("Por favor, faça o upload de um arquivo Excel (.xlsx) para continuar.")
+
+# Exibir o painel de desempenho desta execução (apenas com a instrumentação ativada)
+exibir_painel(finalizar_execucao())
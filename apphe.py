@@ -1,169 +1,239 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 
+from analise import (analise_geral_horas, analise_secretaria_horas, extrato_mensal_cargo, horas_anuais_geral,
+                     horas_anuais_secretarias)
+from cache_resultados import cache_resultados, resumo_cache
+from dados import agregar_envios
+from formatacao import formatar_tabela_br
+from graficos import cache_graficos, grafico_plotly, impressao_tabela
+from horas_extras import (COLUNAS_HORAS_EXTRAS, DIMENSOES_SERVIDORES, carregar_rollup, carregar_servidores,
+                          impressao_rollup, impressao_servidores, incorporar_servidores, janela_anos,
+                          meses_armazenados, preparar_bloco)
+from indice_servidores import construir_indice
+from instrumentacao import etapa, exibir_painel, finalizar_execucao, iniciar_execucao
+from tabelas import exibir_tabela_paginada
+
 # Configurar título da página
 st.set_page_config(page_title='Análise de Horas Extras Realizadas', layout='wide')
 
-# Função para formatar números no padrão brasileiro, incluindo anos
-def format_number_brazilian(value):
-    if isinstance(value, int):
-        return f"{value}"
-    return f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+# Iniciar a medição desta execução (apenas com SMRH_INSTRUMENTACAO=1)
+iniciar_execucao('apphe')
+
+# Função para obter as horas por ano de todas as secretarias e cargos (calculadas uma única vez para os
+# agregados armazenados; ao mudar o intervalo de anos, apenas a janela é recortada)
+def obter_horas_anuais_geral(rollup_df, impressao):
+    return cache_resultados.obter((impressao, 'he_anuais_geral', None), lambda: horas_anuais_geral(rollup_df))
+
+# Função para calcular as tabelas da página "Análise por Secretaria" (ou obtê-las do cache de resultados).
+# As horas por ano das secretarias selecionadas ficam no cache enquanto a seleção não muda.
+def calcular_analise_secretaria(rollup_df, impressao, selected_secretaria, ano_inicial, ano_final):
+    selecao = tuple(sorted(selected_secretaria))
+    anuais = cache_resultados.obter((impressao, 'he_anuais_secretarias', selecao),
+                                    lambda: horas_anuais_secretarias(rollup_df, selected_secretaria))
+    chave = (impressao, 'he_secretaria', (selecao, ano_inicial, ano_final))
+    return cache_resultados.obter(chave, lambda: analise_secretaria_horas(rollup_df, selected_secretaria, ano_inicial, ano_final, anuais))
+
+# Função para calcular as tabelas da página "Análise Geral" (ou obtê-las do cache de resultados)
+def calcular_analise_geral(rollup_df, impressao, ano_inicial, ano_final):
+    anuais = obter_horas_anuais_geral(rollup_df, impressao)
+    return cache_resultados.obter((impressao, 'he_geral', (ano_inicial, ano_final)),
+                                  lambda: analise_geral_horas(rollup_df, ano_inicial, ano_final, anuais))
+
+# Função para calcular o extrato mensal da página "Análise por Cargo" (ou obtê-lo do cache de resultados)
+def calcular_extrato_mensal(rollup_df, impressao, selected_cargo):
+    return cache_resultados.obter((impressao, 'he_cargo', selected_cargo), lambda: extrato_mensal_cargo(rollup_df, selected_cargo))
+
+# Função para obter o índice por servidor (construído uma única vez para os agregados armazenados)
+def obter_indice_servidores():
+    impressao = impressao_servidores()
+    return cache_resultados.obter((impressao, 'he_indice_servidores', None), lambda: construir_indice(carregar_servidores()))
 
 # Título da página
 st.title('Análise de Horas Extras Realizadas')
 
 # Sidebar para navegação
 st.sidebar.title("Navegação")
-pagina = st.sidebar.radio("Escolha a visualização:", ["Análise Geral", "Análise por Secretaria", "Análise por Cargo"])
-
-# Solicitar o upload do arquivo Excel
-uploaded_file = st.sidebar.file_uploader("Faça o upload do arquivo Excel", type=["xlsx"])
-
-if uploaded_file is not None:
-    # Função para carregar os dados com cache
-    @st.cache_data(ttl=60)
-    def load_data(file):
-        # Carregar os dados da planilha
-        data = pd.read_excel(file, sheet_name='base', usecols=['Ano', 'Mes', 'Matricula', 'Secretaria', 'Cod_Cargo', 'Cargo', 'Horas_realizadas'])
-        # Converter a coluna 'Horas_realizadas' para numérico
-        data['Horas_realizadas'] = pd.to_numeric(data['Horas_realizadas'], errors='coerce')
-        # Garantir que a coluna 'Ano' seja tratada como inteiro
-        data['Ano'] = data['Ano'].astype(int)
-        return data
-
-    # Carregar os dados uma única vez e armazenar em cache
-    base_df = load_data(uploaded_file)
-
-    # Criar um dicionário para mapear os meses para nomes curtos
-    meses_dict = {
-        1: "jan", 2: "fev", 3: "mar", 4: "abr", 5: "mai", 6: "jun",
-        7: "jul", 8: "ago", 9: "set", 10: "out", 11: "nov", 12: "dez"
-    }
-
-    # Substituir os números dos meses pelos nomes correspondentes
-    base_df['Mes'] = base_df['Mes'].map(meses_dict)
+pagina = st.sidebar.radio("Escolha a visualização:", ["Análise Geral", "Análise por Secretaria", "Análise por Cargo", "Análise por Servidor"])
+
+# Solicitar o upload dos arquivos Excel (um ou vários)
+uploaded_files = st.sidebar.file_uploader("Faça o upload do arquivo Excel", type=["xlsx"], accept_multiple_files=True)
+
+# Função para incorporar os arquivos enviados aos agregados mensais armazenados.
+# Cada planilha é lida em blocos e agregada por servidor à medida que é lida (várias planilhas em
+# paralelo); apenas os meses contidos nos arquivos são incorporados, aos agregados por servidor e ao
+# rollup derivado deles. Os agregados de cada arquivo ficam armazenados pelo hash do conteúdo,
+# de modo que o mesmo arquivo não é lido outra vez, e meses idênticos aos armazenados não são
+# regravados: a incorporação pode ser repetida a cada execução da página sem alterar o armazenamento.
+def incorporar_upload(files):
+    servidores = agregar_envios(files, DIMENSOES_SERVIDORES, 'Horas_realizadas', colunas=COLUNAS_HORAS_EXTRAS,
+                                preparar=preparar_bloco)
+    return meses_armazenados(incorporar_servidores(servidores))
+
+if uploaded_files:
+    with st.spinner('Incorporando os meses enviados...'), etapa('incorporar_upload'):
+        incorporar_upload(uploaded_files)
+
+# Carregar os agregados mensais de todos os meses já incorporados
+with etapa('carregar_rollup'):
+    impressao_rollup_df = impressao_rollup()
+    rollup_df = carregar_rollup()
+
+if not rollup_df.empty:
+    meses = meses_armazenados(rollup_df)
+    st.sidebar.caption(f"{len(meses)} meses armazenados ({meses[0][1]:02d}/{meses[0][0]} a {meses[-1][1]:02d}/{meses[-1][0]})")
 
     # Se for Análise Geral ou Análise por Secretaria, adicionar seleção de Ano Inicial e Final
-    if pagina in ["Análise Geral", "Análise por Secretaria"]:
+    if pagina in ["Análise Geral", "Análise por Secretaria", "Análise por Servidor"]:
         col1, col2 = st.columns(2)
         with col1:
-            ano_inicial = st.selectbox('Selecione o Ano Inicial', sorted(base_df['Ano'].unique()))
+            ano_inicial = st.selectbox('Selecione o Ano Inicial', sorted(rollup_df['Ano'].unique()))
         with col2:
-            ano_final = st.selectbox('Selecione o Ano Final', sorted(base_df['Ano'].unique(), reverse=True))
-
-        # Filtrar os dados pelo intervalo de anos selecionado
-        filtered_data_by_year = base_df[(base_df['Ano'] >= ano_inicial) & (base_df['Ano'] <= ano_final)]
-    else:
-        filtered_data_by_year = base_df
+            ano_final = st.selectbox('Selecione o Ano Final', sorted(rollup_df['Ano'].unique(), reverse=True))
 
     if pagina == "Análise por Secretaria":
         # Filtros Interativos na Visão Geral
-        selected_secretaria = st.multiselect('Selecione a Secretaria', filtered_data_by_year['Secretaria'].unique())
+        secretarias_anuais, _ = obter_horas_anuais_geral(rollup_df, impressao_rollup_df)
+        secretarias_no_intervalo = janela_anos(secretarias_anuais, ano_inicial, ano_final).index.tolist()
+        selected_secretaria = st.multiselect('Selecione a Secretaria', secretarias_no_intervalo)
 
         # Verificação se o usuário selecionou ao menos uma secretaria
         if not selected_secretaria:
             st.warning('Por favor, selecione ao menos uma secretaria para visualizar os dados.')
         else:
-            # Filtragem dos Dados
-            filtered_data = filtered_data_by_year[filtered_data_by_year['Secretaria'].isin(selected_secretaria)]
-
-            # Agrupando por Cargo, Cod_Cargo e somando as horas realizadas
-            detalhamento_data = filtered_data.groupby(['Cargo', 'Cod_Cargo', 'Ano']).agg({'Horas_realizadas': 'sum'}).reset_index()
-
-            # Criar uma tabela pivô para exibir os dados com colunas para cada ano
-            detalhamento_pivot = detalhamento_data.pivot_table(values='Horas_realizadas', index=['Cargo', 'Cod_Cargo'], columns='Ano', aggfunc='sum').fillna(0)
-            
-            # Aplicar a formatação numérica brasileira
-            detalhamento_pivot_display = detalhamento_pivot.applymap(format_number_brazilian)
-
-            # Gráfico de barras usando Plotly (mantendo o gráfico para os 10 principais cargos)
-            top_10_grouped_data = detalhamento_data.groupby(['Cargo', 'Cod_Cargo']).agg({'Horas_realizadas': 'sum'}).reset_index()
-            top_10_grouped_data = top_10_grouped_data.sort_values(by='Horas_realizadas', ascending=False).head(10)
+            # Calcular o detalhamento e os 10 principais cargos das secretarias selecionadas
+            with etapa('analise_secretaria'):
+                detalhamento_pivot, top_10_grouped_data = calcular_analise_secretaria(
+                    rollup_df, impressao_rollup_df, selected_secretaria, ano_inicial, ano_final)
 
             titulo_grafico = f'Horas Extras realizadas nas secretarias selecionadas entre {ano_inicial} e {ano_final}'
             st.subheader(titulo_grafico)
 
-            fig_barras = px.bar(top_10_grouped_data, x='Cargo', y='Horas_realizadas', 
-                            labels={'Horas_realizadas': 'Horas Extras'}, 
-                            title=titulo_grafico)
-            st.plotly_chart(fig_barras)
+            with etapa('graficos'):
+                fig_barras = grafico_plotly(
+                    (impressao_tabela(top_10_grouped_data), 'barras_cargos', titulo_grafico),
+                    lambda: px.bar(top_10_grouped_data, x='Cargo', y='Horas_realizadas',
+                                   labels={'Horas_realizadas': 'Horas Extras'},
+                                   title=titulo_grafico))
+                st.plotly_chart(fig_barras)
 
             # Exibição da Tabela de Dados Detalhados com colunas de ano
-            st.subheader('Detalhamento dos Dados')
-            st.write(detalhamento_pivot_display)
+            with etapa('exibir_tabela'):
+                st.subheader('Detalhamento dos Dados')
+                exibir_tabela_paginada(detalhamento_pivot, 'tabela_detalhamento')
             
     elif pagina == "Análise Geral":
-        # Agrupamento geral por Secretarias
-        df_secretarias = filtered_data_by_year.groupby(['Ano', 'Secretaria']).agg({
-            'Horas_realizadas': 'sum'
-        }).reset_index()
-
-        # Agrupamento geral por Cargos
-        df_top_cargos = filtered_data_by_year.groupby(['Ano', 'Cod_Cargo', 'Cargo']).agg({
-            'Horas_realizadas': 'sum'
-        }).reset_index()
-
-        # Manter as tabelas completas
-        df_secretarias_pivot = df_secretarias.pivot_table(values='Horas_realizadas', index='Secretaria', columns='Ano', aggfunc='sum').fillna(0)
-        df_top_cargos_pivot = df_top_cargos.pivot_table(values='Horas_realizadas', index='Cargo', columns='Ano', aggfunc='sum').fillna(0)
-
-        # Aplicar a formatação numérica brasileira nas tabelas
-        df_secretarias_pivot_display = df_secretarias_pivot.applymap(format_number_brazilian)
-        df_top_cargos_display = df_top_cargos_pivot.applymap(format_number_brazilian)
-
-        # Mostrar apenas os 10 valores mais altos para os gráficos
-        top_10_secretarias = df_secretarias.groupby('Secretaria')['Horas_realizadas'].sum().nlargest(10).reset_index()
-        top_10_cargos = df_top_cargos.groupby('Cargo')['Horas_realizadas'].sum().nlargest(10).reset_index()
+        # Calcular as tabelas completas e os 10 valores mais altos para os gráficos
+        with etapa('analise_geral'):
+            df_secretarias_pivot, df_top_cargos_pivot, top_10_secretarias, top_10_cargos = calcular_analise_geral(
+                rollup_df, impressao_rollup_df, ano_inicial, ano_final)
 
         # Exibir gráfico de pizza para distribuição percentual de horas por secretaria (top 10)
-        st.subheader('Distribuição Percentual de Horas por Secretaria')
-        fig_pizza_secretarias = px.pie(top_10_secretarias, names='Secretaria', values='Horas_realizadas',
-                                       title='Distribuição Percentual de Horas por Secretaria')
-        fig_pizza_secretarias.update_layout(legend=dict(orientation="h", yanchor="top", y=-0.1, xanchor="center", x=0.5))
-        st.plotly_chart(fig_pizza_secretarias)
-
-        # Exibir gráfico de pizza para distribuição percentual de horas por cargo (top 10)
-        st.subheader('Distribuição Percentual de Horas por Cargo')
-        fig_pizza_cargos = px.pie(top_10_cargos, names='Cargo', values='Horas_realizadas',
-                                  title='Distribuição Percentual de Horas por Código de Cargo')
-        fig_pizza_cargos.update_layout(legend=dict(orientation="h", yanchor="top", y=-0.1, xanchor="center", x=0.5))
-        st.plotly_chart(fig_pizza_cargos)
+        with etapa('graficos'):
+            st.subheader('Distribuição Percentual de Horas por Secretaria')
+            fig_pizza_secretarias = grafico_plotly(
+                (impressao_tabela(top_10_secretarias), 'pizza_secretarias'),
+                lambda: px.pie(top_10_secretarias, names='Secretaria', values='Horas_realizadas',
+                               title='Distribuição Percentual de Horas por Secretaria').update_layout(
+                    legend=dict(orientation="h", yanchor="top", y=-0.1, xanchor="center", x=0.5)))
+            st.plotly_chart(fig_pizza_secretarias)
+
+            # Exibir gráfico de pizza para distribuição percentual de horas por cargo (top 10)
+            st.subheader('Distribuição Percentual de Horas por Cargo')
+            fig_pizza_cargos = grafico_plotly(
+                (impressao_tabela(top_10_cargos), 'pizza_cargos'),
+                lambda: px.pie(top_10_cargos, names='Cargo', values='Horas_realizadas',
+                               title='Distribuição Percentual de Horas por Código de Cargo').update_layout(
+                    legend=dict(orientation="h", yanchor="top", y=-0.1, xanchor="center", x=0.5)))
+            st.plotly_chart(fig_pizza_cargos)
 
         # Exibir tabela de secretarias
-        st.subheader('Horas Realizadas por Secretaria')
-        st.dataframe(df_secretarias_pivot_display)
+        with etapa('exibir_tabelas'):
+            st.subheader('Horas Realizadas por Secretaria')
+            exibir_tabela_paginada(df_secretarias_pivot, 'tabela_secretarias')
 
-        # Exibir tabela de cargos
-        st.subheader('Horas Realizadas por Cargo')
-        st.dataframe(df_top_cargos_display)
+            # Exibir tabela de cargos
+            st.subheader('Horas Realizadas por Cargo')
+            exibir_tabela_paginada(df_top_cargos_pivot, 'tabela_cargos')
 
     elif pagina == "Análise por Cargo":
         # Selecionar um cargo específico
-        selected_cargo = st.selectbox('Selecione o Cargo', sorted(base_df['Cargo'].unique()))
-
-        # Filtrar dados pelo cargo selecionado
-        cargo_data = base_df[base_df['Cargo'] == selected_cargo]
-
-        # Agrupar por ano e mês e somar as horas realizadas
-        extrato_mensal = cargo_data.groupby(['Ano', 'Mes'])['Horas_realizadas'].sum().reset_index()
+        selected_cargo = st.selectbox('Selecione o Cargo', sorted(rollup_df['Cargo'].unique()))
 
-        # Ordenar os meses cronologicamente
-        extrato_mensal['Mes'] = pd.Categorical(extrato_mensal['Mes'], categories=meses_dict.values(), ordered=True)
-        extrato_mensal = extrato_mensal.sort_values(['Ano', 'Mes'])
+        # Calcular o extrato mensal do cargo selecionado
+        with etapa('extrato_mensal'):
+            extrato_mensal = calcular_extrato_mensal(rollup_df, impressao_rollup_df, selected_cargo)
 
-        # Aplicar a formatação numérica brasileira
-        extrato_mensal['Horas_realizadas'] = extrato_mensal['Horas_realizadas'].apply(format_number_brazilian)
-
-        # Exibir os dados
-        st.subheader(f'Extrato de Horas Realizadas - {selected_cargo}')
-        st.dataframe(extrato_mensal)
+        # Exibir os dados com a formatação numérica brasileira (o gráfico usa os valores numéricos)
+        with etapa('exibir_tabela'):
+            st.subheader(f'Extrato de Horas Realizadas - {selected_cargo}')
+            st.dataframe(formatar_tabela_br(extrato_mensal, colunas=['Horas_realizadas']))
 
         # Gráfico de barras das horas realizadas por mês
-        fig_extrato = px.bar(extrato_mensal, x='Mes', y='Horas_realizadas', color='Ano',
-                             labels={'Horas_realizadas': 'Horas Extras'}, 
-                             title=f'Horas Extras Realizadas por Mês - {selected_cargo}')
-        st.plotly_chart(fig_extrato)
+        with etapa('graficos'):
+            fig_extrato = grafico_plotly(
+                (impressao_tabela(extrato_mensal), 'extrato_mensal', selected_cargo),
+                lambda: px.bar(extrato_mensal, x='Mes', y='Horas_realizadas', color='Ano',
+                               labels={'Horas_realizadas': 'Horas Extras'},
+                               title=f'Horas Extras Realizadas por Mês - {selected_cargo}'))
+            st.plotly_chart(fig_extrato)
+
+    elif pagina == "Análise por Servidor":
+        with etapa('indice_servidores'):
+            indice = obter_indice_servidores()
+
+        if not len(indice.matriculas):
+            st.warning('Os meses armazenados não têm o detalhamento por servidor. Envie novamente as planilhas para gerá-lo.')
+        else:
+            # Filtros do ranking: secretarias (opcional), cargo (opcional) e quantidade de servidores
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                selected_secretaria = st.multiselect('Selecione a Secretaria', indice.secretarias.tolist())
+            with col2:
+                selected_cargo = st.selectbox('Selecione o Cargo', ['Todos'] + sorted(indice.cargos.get_level_values('Cargo').unique()))
+            with col3:
+                quantidade = st.number_input('Quantidade de servidores', min_value=1, max_value=100, value=10)
+
+            secretarias_ranking = tuple(sorted(selected_secretaria)) or None
+            cargo_ranking = None if selected_cargo == 'Todos' else selected_cargo
+
+            # Calcular os servidores com mais horas extras (ou obtê-los do cache de resultados)
+            with etapa('ranking_servidores'):
+                chave = (impressao_servidores(), 'he_ranking_servidores',
+                         (int(quantidade), secretarias_ranking, cargo_ranking, ano_inicial, ano_final))
+                ranking = cache_resultados.obter(chave, lambda: indice.ranking(
+                    int(quantidade), secretarias_ranking, cargo_ranking, ano_inicial, ano_final))
+
+            if ranking.empty:
+                st.warning('Nenhuma hora extra encontrada para os filtros selecionados.')
+            else:
+                titulo_ranking = f'Servidores com mais horas extras entre {ano_inicial} e {ano_final}'
+                st.subheader(titulo_ranking)
+                with etapa('graficos'):
+                    fig_ranking = grafico_plotly(
+                        (impressao_tabela(ranking), 'ranking_servidores', titulo_ranking),
+                        lambda: px.bar(ranking.assign(Matricula=ranking['Matricula'].astype(str)),
+                                       x='Horas_realizadas', y='Matricula', orientation='h',
+                                       labels={'Horas_realizadas': 'Horas Extras'},
+                                       title=titulo_ranking).update_yaxes(autorange='reversed'))
+                    st.plotly_chart(fig_ranking)
+
+                with etapa('exibir_tabela'):
+                    st.dataframe(formatar_tabela_br(ranking, colunas=['Horas_realizadas', 'Participação', 'Escore_Z']))
+
+                # Histórico mensal de um dos servidores do ranking, lido diretamente do índice
+                selected_matricula = st.selectbox('Selecione a Matrícula', ranking['Matricula'].tolist())
+                with etapa('historico_servidor'):
+                    historico = indice.historico(selected_matricula)
+
+                st.subheader(f'Extrato de Horas Realizadas - Matrícula {selected_matricula}')
+                st.dataframe(formatar_tabela_br(historico, colunas=['Horas_realizadas']))
+
+    # Exibir os contadores do cache de resultados e do cache de gráficos
+    st.sidebar.caption(resumo_cache())
+    st.sidebar.caption(resumo_cache(cache_graficos, 'Cache de gráficos'))
 else:
     st.info("Por favor, faça o upload do arquivo Excel para começar.")
+
+# Exibir o painel de desempenho desta execução (apenas com a instrumentação ativada)
+exibir_painel(finalizar_execucao())
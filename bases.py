@@ -0,0 +1,47 @@
+import os
+import threading
+
+from cubo import construir_cubo
+from dados import carregar_bases, impressao_digital
+
+# Diretório das planilhas distribuídas junto com o aplicativo
+DIRETORIO_BASES = os.path.dirname(os.path.abspath(__file__))
+
+# Registro das bases de servidores disponíveis (nome exibido -> planilha e aba)
+BASES_SERVIDORES = {}
+
+# Cubos já carregados: nome -> (impressão da planilha, cubo)
+_cubos = {}
+_trava = threading.Lock()
+
+
+# Função para registrar uma base de servidores; nada é lido até que a base seja usada.
+# Uma base pode ser formada por várias planilhas (por exemplo, uma por ano): basta informar
+# uma lista de caminhos, que serão lidos em paralelo e combinados.
+def registrar_base(nome, caminho, sheet_name='base'):
+    caminhos = [caminho] if isinstance(caminho, str) else list(caminho)
+    caminhos = [c if os.path.isabs(c) else os.path.join(DIRETORIO_BASES, c) for c in caminhos]
+    BASES_SERVIDORES[nome] = {'caminhos': caminhos, 'sheet_name': sheet_name}
+
+
+registrar_base('base.xlsx', 'base.xlsx')
+registrar_base('base2017.xlsx', 'base2017.xlsx')
+
+
+# Função para obter o cubo de quantitativos de uma base registrada.
+# A base só é lida (do Parquet em cache ou das planilhas) na primeira vez que é pedida, e o cubo
+# fica em memória para todas as sessões do processo; se uma planilha mudar, o cubo é reconstruído.
+# Apenas o cubo é mantido; as linhas da base são descartadas após a construção.
+def obter_cubo(nome):
+    base = BASES_SERVIDORES[nome]
+    impressao = tuple(impressao_digital(caminho)[0] for caminho in base['caminhos'])
+    carregado = _cubos.get(nome)
+    if carregado is not None and carregado[0] == impressao:
+        return carregado[1]
+
+    with _trava:
+        carregado = _cubos.get(nome)
+        if carregado is None or carregado[0] != impressao:
+            cubo = construir_cubo(carregar_bases(base['caminhos'], sheet_name=base['sheet_name']))
+            _cubos[nome] = (impressao, cubo)
+        return _cubos[nome][1]
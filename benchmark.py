@@ -0,0 +1,323 @@
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.io.formats.style import Styler
+from streamlit import dataframe_util
+from streamlit.elements.lib.pandas_styler_utils import marshall_styler
+from streamlit.proto.ArrowData_pb2 import ArrowData
+
+import dados
+from analise import (analise_geral_horas, analise_secretaria_horas, detalhamentos_secretarias, extrato_mensal_cargo,
+                     horas_anuais_geral, panorama_secretaria, panoramas_secretarias, variacao_oscilacao)
+from cache_resultados import cache_resultados
+from cubo import construir_cubo
+from dados import agregar_em_blocos, otimizar_tipos
+from formatacao import estilizar_tabela_br, formatar_tabela_br
+from horas_extras import COLUNAS_HORAS_EXTRAS, DIMENSOES_ROLLUP, DIMENSOES_SERVIDORES, preparar_bloco
+from indice_servidores import construir_indice
+from tabelas import ordenar_linhas, selecionar_pagina
+
+
+# Função para gerar uma base de servidores sintética com o mesmo esquema da aba 'base' de base.xlsx
+def gerar_base_servidores(linhas, secretarias, cargos, anos, ano_inicial=2014, semente=0):
+    gerador = np.random.default_rng(semente)
+    matriculas = gerador.integers(100000, 100000 + max(linhas // max(anos, 1), 1), linhas)
+    codigos_cargo = gerador.integers(0, cargos, linhas)
+    codigos_secretaria = gerador.integers(0, secretarias, linhas)
+    codigos_dotacao = gerador.integers(0, secretarias * 20, linhas)
+    return pd.DataFrame({
+        'Matrícula': matriculas,
+        'Nome': pd.Series(matriculas).map('SERVIDOR {}'.format),
+        'Cargo': pd.Series(codigos_cargo).map('C{:04d}'.format),
+        'Descrição_Cargo': pd.Series(codigos_cargo).map('CARGO {:04d}'.format),
+        'Secretaria': pd.Series(codigos_secretaria).map('SEC{:03d}'.format),
+        'Cod_Dotação': codigos_dotacao,
+        'Local_Dotação': pd.Series(codigos_dotacao).map('LOTACAO {:05d}'.format),
+        'Ano': ano_inicial + gerador.integers(0, anos, linhas),
+    })
+
+
+# Função para gerar uma planilha de horas extras sintética com o mesmo esquema usado por apphe.py
+def gerar_base_horas_extras(linhas, secretarias, cargos, anos, meses=12, ano_inicial=2014, semente=0):
+    gerador = np.random.default_rng(semente + 1)
+    codigos_cargo = gerador.integers(0, cargos, linhas)
+    return pd.DataFrame({
+        'Ano': ano_inicial + gerador.integers(0, anos, linhas),
+        'Mes': gerador.integers(1, meses + 1, linhas),
+        'Matricula': gerador.integers(100000, 100000 + max(linhas // 20, 1), linhas),
+        'Secretaria': pd.Series(gerador.integers(0, secretarias, linhas)).map('SEC{:03d}'.format),
+        'Cod_Cargo': pd.Series(codigos_cargo).map('C{:04d}'.format),
+        'Cargo': pd.Series(codigos_cargo).map('CARGO {:04d}'.format),
+        'Horas_realizadas': gerador.gamma(2.0, 10.0, linhas).round(2),
+    })
+
+
+# Função para medir o tempo de uma etapa, repetindo-a e guardando o resultado da última execução.
+# Com `sem_cache`, o cache de resultados é esvaziado antes de cada repetição (fora da medição), para
+# que as repetições meçam o cálculo, e não acertos no cache.
+def medir(resultados, nome, funcao, repeticoes, sem_cache=False):
+    tempos = []
+    retorno = None
+    for _ in range(repeticoes):
+        if sem_cache:
+            cache_resultados.limpar()
+        inicio = time.perf_counter()
+        retorno = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    resultados[nome] = {
+        'media_s': float(np.mean(tempos)),
+        'minimo_s': float(np.min(tempos)),
+        'maximo_s': float(np.max(tempos)),
+        'repeticoes': repeticoes,
+    }
+    return retorno
+
+
+# Função para listar todos os intervalos (ano inicial, ano final) possíveis, simulando o usuário
+# percorrendo os seletores de ano
+def intervalos_anos(anos):
+    return [(int(inicial), int(final)) for posicao, inicial in enumerate(anos) for final in anos[posicao:]]
+
+
+# Função para dividir um DataFrame em blocos, simulando a leitura em blocos da planilha
+def em_blocos(df, tamanho_bloco):
+    for inicio in range(0, len(df), tamanho_bloco):
+        yield otimizar_tipos(df.iloc[inicio:inicio + tamanho_bloco])
+
+
+# Etapas da base de servidores (app.py e appfile.py)
+def medir_servidores(resultados, base, repeticoes, diretorio, excel, arquivos):
+    if excel:
+        caminho_excel = os.path.join(diretorio, 'base_sintetica.xlsx')
+        base.to_excel(caminho_excel, sheet_name='base', index=False)
+        colunas = ['Secretaria', 'Cargo', 'Descrição_Cargo', 'Ano']
+        medir(resultados, 'carga.excel_em_blocos', lambda: agregar_em_blocos(
+            dados.ler_planilha_em_blocos(caminho_excel, colunas=colunas), colunas), 1)
+
+        # A mesma base dividida em várias planilhas, lidas em sequência e em paralelo
+        caminhos = []
+        for posicao, parte in enumerate(np.array_split(np.arange(len(base)), arquivos)):
+            caminhos.append(os.path.join(diretorio, f'base_sintetica_{posicao}.xlsx'))
+            base.iloc[parte].to_excel(caminhos[-1], sheet_name='base', index=False)
+        medir(resultados, 'carga.varias_planilhas_sequencial',
+              lambda: dados.agregar_planilhas(caminhos, colunas, colunas=colunas, processos=1), 1)
+        medir(resultados, 'carga.varias_planilhas_paralelo',
+              lambda: dados.agregar_planilhas(caminhos, colunas, colunas=colunas), 1)
+        medir(resultados, 'carga.parquet_conversao', lambda: dados.carregar_base(caminho_excel), 1)
+        base = medir(resultados, 'carga.parquet_leitura', lambda: dados.carregar_base(caminho_excel), repeticoes)
+    else:
+        base = medir(resultados, 'carga.tipos_compactos', lambda: otimizar_tipos(base), repeticoes)
+
+    cubo = medir(resultados, 'cubo.construcao', lambda: construir_cubo(base), repeticoes)
+    secretaria = cubo.secretarias[0]
+    ano_inicial, ano_final = int(cubo.anos[0]), int(cubo.anos[-1])
+
+    # Filtro por máscara sobre as linhas (abordagem original das páginas) e fatia equivalente do cubo
+    medir(resultados, 'filtro.mascara_linhas', lambda: base[
+        (base['Secretaria'] == secretaria) & (base['Ano'] >= ano_inicial) & (base['Ano'] <= ano_final)
+    ].groupby(['Cargo', 'Descrição_Cargo', 'Ano'], observed=True).size().unstack(fill_value=0), repeticoes)
+    medir(resultados, 'filtro.fatia_cubo', lambda: cubo.por_cargo([secretaria], ano_inicial, ano_final), repeticoes, sem_cache=True)
+
+    medir(resultados, 'appfile.calcular_variacao_oscilacao_generica.secretaria',
+          lambda: variacao_oscilacao(cubo, ano_inicial, ano_final, 'Secretaria'), repeticoes, sem_cache=True)
+    painel_cargo = medir(resultados, 'appfile.calcular_variacao_oscilacao_generica.cargo',
+                         lambda: variacao_oscilacao(cubo, ano_inicial, ano_final, 'Cargo'), repeticoes, sem_cache=True)
+    medir(resultados, 'appfile.pagina_analise_secretaria',
+          lambda: panorama_secretaria(cubo, list(cubo.secretarias[:3]), ano_inicial, ano_final), repeticoes, sem_cache=True)
+
+    # Mudança apenas do intervalo de anos: a matriz anual da seleção é calculada uma vez por varredura (e
+    # guardada no cache de resultados); cada intervalo recorta apenas a sua janela de anos
+    intervalos = intervalos_anos(cubo.anos)
+    medir(resultados, 'cubo.matriz_anual.cargo', lambda: cubo.matriz_anual('Cargo'), repeticoes)
+    medir(resultados, 'appfile.mudanca_intervalo.cargo', lambda: [
+        variacao_oscilacao(cubo, inicial, final, 'Cargo') for inicial, final in intervalos], repeticoes, sem_cache=True)
+
+    # Relatórios de todas as secretarias: uma consulta por secretaria e o cálculo em lote
+    medir(resultados, 'relatorios.secretarias_uma_a_uma', lambda: [
+        panorama_secretaria(cubo, [nome], ano_inicial, ano_final) for nome in cubo.secretarias], repeticoes, sem_cache=True)
+    medir(resultados, 'relatorios.secretarias_em_lote',
+          lambda: list(panoramas_secretarias(cubo, ano_inicial, ano_final)), repeticoes, sem_cache=True)
+
+    # Formatação de uma página do quantitativo por cargo, serializada como pelo st.dataframe:
+    # pelo Styler (usado nas tabelas paginadas) e pelo formatador vetorizado
+    pagina_cargo = selecionar_pagina(painel_cargo, ordenar_linhas(painel_cargo, busca='1'))
+    medir(resultados, 'formatacao.quantitativo_cargo_pagina_estilo', lambda: enviar_ao_navegador(estilizar_tabela_br(
+        pagina_cargo, casas=0).set_properties(**{'text-align': 'center'})), repeticoes)
+    medir(resultados, 'formatacao.quantitativo_cargo_pagina_vetorizada',
+          lambda: enviar_ao_navegador(formatar_tabela_br(pagina_cargo, casas=0)), repeticoes)
+
+
+# Etapas da base de horas extras (apphe.py)
+def medir_horas_extras(resultados, base, repeticoes, tamanho_bloco, diretorio, excel, arquivos):
+    if excel:
+        # Ida e volta pelo .xlsx: uma planilha lida em blocos e agregada por servidor à medida que é
+        # lida, e o envio de várias planilhas como em apphe.py (agregadas em paralelo na primeira vez
+        # e lidas dos agregados armazenados pelo hash do conteúdo nas seguintes)
+        caminho_excel = os.path.join(diretorio, 'horas_extras_sintetica.xlsx')
+        base.to_excel(caminho_excel, sheet_name='base', index=False)
+        medir(resultados, 'carga.horas_extras.excel_em_blocos', lambda: dados.agregar_planilhas(
+            [caminho_excel], DIMENSOES_SERVIDORES, 'Horas_realizadas', colunas=COLUNAS_HORAS_EXTRAS,
+            preparar=preparar_bloco, processos=1), 1)
+
+        envios = []
+        for parte in np.array_split(np.arange(len(base)), arquivos):
+            saida = io.BytesIO()
+            base.iloc[parte].to_excel(saida, sheet_name='base', index=False)
+            envios.append(saida.getvalue())
+        medir(resultados, 'carga.horas_extras.envios_paralelo', lambda: dados.agregar_envios(
+            envios, DIMENSOES_SERVIDORES, 'Horas_realizadas', colunas=COLUNAS_HORAS_EXTRAS, preparar=preparar_bloco), 1)
+        medir(resultados, 'carga.horas_extras.envios_armazenados', lambda: dados.agregar_envios(
+            envios, DIMENSOES_SERVIDORES, 'Horas_realizadas', colunas=COLUNAS_HORAS_EXTRAS, preparar=preparar_bloco),
+            repeticoes)
+
+    rollup = medir(resultados, 'apphe.rollup', lambda: agregar_em_blocos(
+        em_blocos(base, tamanho_bloco), DIMENSOES_ROLLUP, 'Horas_realizadas'), 1)
+    anos = sorted(rollup['Ano'].unique())
+    ano_inicial, ano_final = anos[0], anos[-1]
+    secretarias = list(rollup['Secretaria'].cat.categories[:3])
+    cargo = rollup['Cargo'].cat.categories[0]
+
+    _, pivot_cargos, _, _ = medir(resultados, 'apphe.analise_geral',
+                                  lambda: analise_geral_horas(rollup, ano_inicial, ano_final), repeticoes)
+    medir(resultados, 'apphe.analise_secretaria',
+          lambda: analise_secretaria_horas(rollup, secretarias, ano_inicial, ano_final), repeticoes)
+    extrato = medir(resultados, 'apphe.analise_cargo', lambda: extrato_mensal_cargo(rollup, cargo), repeticoes)
+
+    # Mudança apenas do intervalo de anos: horas por ano calculadas uma vez e recortadas por intervalo,
+    # comparadas ao filtro e agrupamento dos agregados a cada intervalo
+    intervalos = intervalos_anos(anos)
+    anuais = medir(resultados, 'apphe.horas_anuais_geral', lambda: horas_anuais_geral(rollup), repeticoes)
+    medir(resultados, 'apphe.mudanca_intervalo.geral', lambda: [
+        analise_geral_horas(rollup, inicial, final, anuais) for inicial, final in intervalos], repeticoes)
+    medir(resultados, 'apphe.mudanca_intervalo.geral_reagrupando', lambda: [
+        analise_geral_horas(rollup, inicial, final) for inicial, final in intervalos], repeticoes)
+
+    # Índice por servidor: ranking por seleção parcial e histórico pelos deslocamentos, comparados
+    # ao agrupamento com ordenação completa e à varredura da tabela inteira
+    servidores = medir(resultados, 'apphe.agregados_servidores', lambda: agregar_em_blocos(
+        em_blocos(base, tamanho_bloco), DIMENSOES_SERVIDORES, 'Horas_realizadas'), 1)
+    indice = medir(resultados, 'apphe.indice_servidores', lambda: construir_indice(servidores), repeticoes)
+    matricula = servidores['Matricula'].iloc[len(servidores) // 2]
+    ranking = medir(resultados, 'apphe.ranking_servidores',
+                    lambda: indice.ranking(10, None, cargo, ano_inicial, ano_final), repeticoes)
+    medir(resultados, 'apphe.ranking_servidores_ordenacao_completa', lambda: servidores[
+        (servidores['Cargo'] == cargo) & servidores['Ano'].between(ano_inicial, ano_final)
+    ].groupby('Matricula')['Horas_realizadas'].sum().sort_values(ascending=False).head(10), repeticoes)
+    historico = medir(resultados, 'apphe.historico_servidor', lambda: indice.historico(matricula), repeticoes)
+    medir(resultados, 'apphe.historico_servidor_varredura', lambda: servidores[
+        servidores['Matricula'] == matricula].sort_values(['Ano', 'Mes']), repeticoes)
+
+    # Detalhamento de todas as secretarias: uma consulta por secretaria e o cálculo em lote
+    todas = rollup['Secretaria'].cat.categories
+    medir(resultados, 'relatorios.horas_secretarias_uma_a_uma', lambda: [
+        analise_secretaria_horas(rollup, [nome], ano_inicial, ano_final) for nome in todas], repeticoes)
+    medir(resultados, 'relatorios.horas_secretarias_em_lote',
+          lambda: list(detalhamentos_secretarias(rollup, ano_inicial, ano_final)), repeticoes)
+
+    # Formatação das tabelas nos formatos exibidos pela página, serializadas como pelo st.dataframe:
+    # uma página do pivot de cargos pelo Styler e pelo formatador vetorizado, as tabelas pequenas sem
+    # paginação (extrato, ranking e histórico) e a tabela inteira, comparada à conversão célula a
+    # célula para texto usada antes
+    pagina_cargos = selecionar_pagina(
+        pivot_cargos, ordenar_linhas(pivot_cargos, ordenar_por=pivot_cargos.columns[-1], crescente=False))
+    medir(resultados, 'formatacao.pivot_cargos_pagina_estilo',
+          lambda: enviar_ao_navegador(estilizar_tabela_br(pagina_cargos)), repeticoes)
+    medir(resultados, 'formatacao.pivot_cargos_pagina_vetorizada',
+          lambda: enviar_ao_navegador(formatar_tabela_br(pagina_cargos)), repeticoes)
+    medir(resultados, 'formatacao.extrato_mensal',
+          lambda: enviar_ao_navegador(formatar_tabela_br(extrato, colunas=['Horas_realizadas'])), repeticoes)
+    medir(resultados, 'formatacao.ranking_servidores', lambda: enviar_ao_navegador(formatar_tabela_br(
+        ranking, colunas=['Horas_realizadas', 'Participação', 'Escore_Z'])), repeticoes)
+    medir(resultados, 'formatacao.historico_servidor',
+          lambda: enviar_ao_navegador(formatar_tabela_br(historico, colunas=['Horas_realizadas'])), repeticoes)
+    medir(resultados, 'formatacao.pivot_cargos_vetorizada', lambda: formatar_tabela_br(pivot_cargos), repeticoes)
+    medir(resultados, 'formatacao.pivot_cargos_por_celula', lambda: pivot_cargos.map(
+        lambda valor: f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")), repeticoes)
+
+
+# Função para serializar uma tabela como o st.dataframe faz ao enviá-la ao navegador (um Styler
+# só formata as células nesse momento)
+def enviar_ao_navegador(exibicao):
+    if isinstance(exibicao, Styler):
+        marshall_styler(ArrowData(), exibicao, 'benchmark')
+        exibicao = exibicao.data
+    return dataframe_util.convert_pandas_df_to_arrow_bytes(exibicao)
+
+
+# Função para identificar a versão do código medida (commit atual, quando disponível)
+def versao_codigo():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Mede o tempo de cada etapa das páginas com bases sintéticas.')
+    parser.add_argument('--linhas', type=int, default=200_000, help='linhas da base de servidores')
+    parser.add_argument('--linhas-horas-extras', type=int, default=None, help='linhas da base de horas extras (padrão: --linhas)')
+    parser.add_argument('--secretarias', type=int, default=30)
+    parser.add_argument('--cargos', type=int, default=150)
+    parser.add_argument('--anos', type=int, default=11)
+    parser.add_argument('--meses', type=int, default=12)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--tamanho-bloco', type=int, default=dados.TAMANHO_BLOCO)
+    parser.add_argument('--excel', action='store_true', help='gravar e ler as bases em .xlsx (lento para bases grandes)')
+    parser.add_argument('--arquivos', type=int, default=4, help='planilhas em que a base é dividida para a leitura paralela (com --excel)')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--saida', help='arquivo JSON de saída (padrão: saída padrão)')
+    args = parser.parse_args(argumentos)
+
+    parametros = vars(args).copy()
+    parametros.pop('saida')
+    resultados = {}
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        # Isolar o cache de Parquet da execução em um diretório temporário
+        dados.DIRETORIO_CACHE = os.path.join(diretorio, 'cache')
+        dados.DIRETORIO_ENVIOS = os.path.join(dados.DIRETORIO_CACHE, 'envios')
+
+        base = medir(resultados, 'geracao.servidores', lambda: gerar_base_servidores(
+            args.linhas, args.secretarias, args.cargos, args.anos, semente=args.semente), 1)
+        medir_servidores(resultados, base, args.repeticoes, diretorio, args.excel, args.arquivos)
+        del base
+
+        horas_extras = medir(resultados, 'geracao.horas_extras', lambda: gerar_base_horas_extras(
+            args.linhas_horas_extras or args.linhas, args.secretarias, args.cargos, args.anos, args.meses,
+            semente=args.semente), 1)
+        medir_horas_extras(resultados, horas_extras, args.repeticoes, args.tamanho_bloco, diretorio, args.excel,
+                           args.arquivos)
+
+    relatorio = {
+        'versao': versao_codigo(),
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'ambiente': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'nucleos': os.cpu_count(),
+            'plataforma': platform.platform(),
+        },
+        'parametros': parametros,
+        'etapas': resultados,
+    }
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
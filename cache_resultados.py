@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Caches criados com nome, por nome (usado pela instrumentação para contar acertos e falhas)
+CACHES = {}
+
+
+# Cache de resultados compartilhado por todas as sessões e usuários do processo.
+# As chaves seguem o formato (impressão do conjunto de dados, página, seleção); os itens são
+# removidos pelo critério LRU quando a capacidade é atingida e expiram após `ttl` segundos.
+# Os valores são compartilhados: quem os recebe não deve alterá-los.
+class CacheResultados:
+    def __init__(self, capacidade=256, ttl=None, nome=None):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._itens = OrderedDict()  # chave -> (instante de gravação, valor)
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        if nome is not None:
+            CACHES[nome] = self
+
+    # Função para obter o valor da chave, calculando-o (e armazenando) quando ausente ou expirado
+    def obter(self, chave, calcular):
+        agora = time.monotonic()
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is not None and (self.ttl is None or agora - item[0] <= self.ttl):
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return item[1]
+            self.falhas += 1
+
+        # O cálculo é feito fora da trava para não bloquear as demais sessões
+        valor = calcular()
+
+        with self._trava:
+            self._itens[chave] = (time.monotonic(), valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+                self.remocoes += 1
+        return valor
+
+    # Função para descartar todos os itens (os contadores são mantidos)
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+
+    # Função para consultar os contadores de uso do cache
+    def estatisticas(self):
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {
+                'itens': len(self._itens),
+                'capacidade': self.capacidade,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'remocoes': self.remocoes,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            }
+
+
+# Instância única usada pelas páginas; capacidade e TTL podem ser ajustados por variáveis de ambiente
+cache_resultados = CacheResultados(
+    capacidade=int(os.environ.get('SMRH_CACHE_CAPACIDADE', 256)),
+    ttl=float(os.environ['SMRH_CACHE_TTL']) if os.environ.get('SMRH_CACHE_TTL') else None,
+    nome='resultados',
+)
+
+
+# Função para montar o texto com os contadores exibido na barra lateral das páginas
+def resumo_cache(cache=None, nome='Cache de resultados'):
+    estatisticas = (cache or cache_resultados).estatisticas()
+    return (f"{nome}: {estatisticas['acertos']} acertos, {estatisticas['falhas']} falhas "
+            f"({estatisticas['taxa_acerto']:.0%}), {estatisticas['itens']}/{estatisticas['capacidade']} itens")
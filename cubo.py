@@ -0,0 +1,162 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from cache_resultados import cache_resultados
+from dados import codificar
+
+
+# Cubo denso de quantitativos de servidores indexado por (Secretaria, Cargo, Ano).
+# O cargo é identificado pelo par (Cargo, Descrição_Cargo), como nas tabelas das páginas.
+# O cubo é construído uma única vez por base; as páginas respondem fatiando e somando o array.
+# O mesmo objeto é compartilhado por todas as sessões, por isso as contagens são somente leitura.
+class CuboQuantitativo:
+    def __init__(self, secretarias, cargos, anos, contagens):
+        self.secretarias = secretarias  # pd.Index com os nomes das secretarias (ordenados)
+        self.cargos = cargos            # pd.MultiIndex (Cargo, Descrição_Cargo) (ordenado)
+        self.anos = anos                # np.ndarray com todos os anos entre o menor e o maior
+        self.contagens = contagens      # np.ndarray (secretaria x cargo x ano)
+        self.contagens.flags.writeable = False
+        self.impressao = self._calcular_impressao()
+
+    # Função para calcular a impressão digital do cubo, usada como chave dos caches de resultados
+    def _calcular_impressao(self):
+        sha = hashlib.sha256()
+        sha.update('\x1f'.join(self.secretarias).encode('utf-8'))
+        sha.update('\x1f'.join(f"{cargo}\x1e{descricao}" for cargo, descricao in self.cargos).encode('utf-8'))
+        sha.update(np.ascontiguousarray(self.anos, dtype=np.int64).tobytes())
+        sha.update(np.ascontiguousarray(self.contagens).tobytes())
+        return sha.hexdigest()
+
+    # Função para obter a posição dos anos dentro do intervalo selecionado
+    def _fatia_anos(self, ano_inicial=None, ano_final=None):
+        inicio = 0 if ano_inicial is None else int(np.searchsorted(self.anos, ano_inicial, side='left'))
+        fim = len(self.anos) if ano_final is None else int(np.searchsorted(self.anos, ano_final, side='right'))
+        return slice(inicio, fim)
+
+    # Função para obter as posições das secretarias selecionadas (None = todas)
+    def _posicoes_secretarias(self, secretarias):
+        if secretarias is None:
+            return slice(None)
+        posicoes = self.secretarias.get_indexer(list(secretarias))
+        return posicoes[posicoes >= 0]
+
+    # Função para obter a matriz anual (entidade x ano, com todos os anos do cubo) do nível pedido
+    # ('Secretaria' ou 'Cargo'), somando as secretarias selecionadas (None = todas). Ela não depende do
+    # intervalo de anos. Retorna (entidades, matriz, anos).
+    def matriz_anual(self, nivel='Secretaria', secretarias=None):
+        posicoes = self._posicoes_secretarias(secretarias)
+        if nivel == 'Secretaria':
+            return self.secretarias[posicoes], self.contagens[posicoes].sum(axis=1), self.anos
+        return self.cargos, self.contagens[posicoes].sum(axis=0), self.anos
+
+    # Função para obter a matriz (entidade x ano) do nível pedido dentro do intervalo de anos. A matriz
+    # anual da seleção fica no cache de resultados, de modo que ao mudar apenas o intervalo somente a
+    # janela de anos é recortada. A matriz tem uma coluna para cada ano do intervalo, mesmo sem
+    # servidores, e omite as entidades sem servidores no intervalo. Retorna (entidades, matriz, anos).
+    def matriz(self, nivel='Secretaria', secretarias=None, ano_inicial=None, ano_final=None):
+        selecao = None if secretarias is None else tuple(sorted(secretarias))
+        indice, matriz, anos = cache_resultados.obter((self.impressao, 'matriz_anual', (nivel, selecao)),
+                                                      lambda: self.matriz_anual(nivel, secretarias))
+        fatia = self._fatia_anos(ano_inicial, ano_final)
+        matriz = matriz[:, fatia]
+        mantidos = matriz.sum(axis=1) > 0
+        return indice[mantidos], matriz[mantidos], anos[fatia]
+
+    # Função para montar a tabela (entidade x ano) a partir da matriz
+    def _montar_tabela(self, indice, matriz, anos):
+        tabela = pd.DataFrame(matriz, index=indice, columns=pd.Index(anos, name='Ano'))
+        return tabela.reset_index()
+
+    # Quantitativo por Cargo e Ano, somando as secretarias selecionadas (None = todas)
+    def por_cargo(self, secretarias=None, ano_inicial=None, ano_final=None):
+        return self._montar_tabela(*self.matriz('Cargo', secretarias, ano_inicial, ano_final))
+
+    # Total de servidores por Ano para as secretarias selecionadas (None = todas)
+    def total_por_ano(self, secretarias=None, ano_inicial=None, ano_final=None):
+        fatia = self._fatia_anos(ano_inicial, ano_final)
+        totais = self.contagens[self._posicoes_secretarias(secretarias)][:, :, fatia].sum(axis=(0, 1))
+        return pd.Series(totais, index=pd.Index(self.anos[fatia], name='Ano'))
+
+
+# Função para construir o cubo a partir da base de servidores (uma linha por servidor e ano).
+# Também aceita contagens já agregadas: basta informar a coluna com a quantidade de cada linha.
+def construir_cubo(df, coluna_quantidade=None):
+    # Descartar linhas sem Secretaria, Cargo, Descrição ou Ano, como faz o groupby
+    df = df.dropna(subset=['Secretaria', 'Cargo', 'Descrição_Cargo', 'Ano'])
+
+    # Trabalhar sobre os códigos inteiros das dimensões, sem comparar textos linha a linha
+    codigos_secretaria, secretarias = codificar(df['Secretaria'])
+    codigos_codigo, codigos = codificar(df['Cargo'])
+    codigos_descricao, descricoes = codificar(df['Descrição_Cargo'])
+
+    # Cada cargo é um par (Cargo, Descrição_Cargo); combinar os dois códigos em um único inteiro
+    par = codigos_codigo.astype(np.int64) * len(descricoes) + codigos_descricao
+    codigos_cargo, pares = pd.factorize(par, sort=True)
+    cargos = pd.MultiIndex.from_arrays(
+        [codigos[pares // len(descricoes)], descricoes[pares % len(descricoes)]],
+        names=['Cargo', 'Descrição_Cargo'],
+    )
+
+    anos_df = df['Ano'].to_numpy(dtype=np.int64)
+    anos = np.arange(anos_df.min(), anos_df.max() + 1) if len(anos_df) else np.array([], dtype=np.int64)
+    codigos_ano = anos_df - (anos[0] if len(anos) else 0)
+
+    # Contagem de linhas por combinação usando um único bincount sobre o índice linear
+    forma = (len(secretarias), len(cargos), len(anos))
+    indice_linear = np.ravel_multi_index((codigos_secretaria, codigos_cargo, codigos_ano), forma)
+    pesos = None if coluna_quantidade is None else df[coluna_quantidade].to_numpy(dtype=np.float64)
+    contagens = np.bincount(indice_linear, weights=pesos, minlength=int(np.prod(forma)))
+    contagens = np.rint(contagens).reshape(forma).astype(np.int32)
+
+    return CuboQuantitativo(
+        pd.Index(secretarias, name='Secretaria'),
+        cargos,
+        anos,
+        contagens,
+    )
+
+
+# Função para alinhar dois cubos nos mesmos eixos: união das secretarias e dos cargos e
+# apenas os anos presentes nas duas bases. O custo depende do número de grupos, não de linhas.
+def alinhar_cubos(cubo_a, cubo_b):
+    secretarias = cubo_a.secretarias.union(cubo_b.secretarias)
+    cargos = cubo_a.cargos.union(cubo_b.cargos)
+    anos = np.intersect1d(cubo_a.anos, cubo_b.anos)
+
+    def reindexar(cubo):
+        contagens = np.zeros((len(secretarias), len(cargos), len(anos)), dtype=np.int32)
+        posicoes_secretarias = secretarias.get_indexer(cubo.secretarias)
+        posicoes_cargos = cargos.get_indexer(cubo.cargos)
+        posicoes_anos = np.searchsorted(cubo.anos, anos)
+        contagens[np.ix_(posicoes_secretarias, posicoes_cargos)] = cubo.contagens[:, :, posicoes_anos]
+        return contagens
+
+    return secretarias, cargos, anos, reindexar(cubo_a), reindexar(cubo_b)
+
+
+# Função para comparar o quantitativo de duas bases por Secretaria ou por Cargo nos anos em comum.
+# Retorna uma linha por (entidade, Ano) com o quantitativo de cada base e a diferença (B - A),
+# omitindo as combinações sem servidores nas duas bases.
+def comparar_cubos(cubo_a, cubo_b, nivel='Secretaria', secretarias=None, nomes=('Base A', 'Base B')):
+    todas_secretarias, cargos, anos, contagens_a, contagens_b = alinhar_cubos(cubo_a, cubo_b)
+
+    if secretarias is not None:
+        posicoes = todas_secretarias.get_indexer(list(secretarias))
+        posicoes = posicoes[posicoes >= 0]
+        todas_secretarias = todas_secretarias[posicoes]
+        contagens_a, contagens_b = contagens_a[posicoes], contagens_b[posicoes]
+
+    if nivel == 'Secretaria':
+        matriz_a, matriz_b, indice = contagens_a.sum(axis=1), contagens_b.sum(axis=1), todas_secretarias
+    else:
+        matriz_a, matriz_b, indice = contagens_a.sum(axis=0), contagens_b.sum(axis=0), cargos
+
+    comparacao = indice.to_frame(index=False).loc[np.repeat(np.arange(len(indice)), len(anos))].reset_index(drop=True)
+    comparacao['Ano'] = np.tile(anos, len(indice))
+    comparacao[nomes[0]] = matriz_a.ravel()
+    comparacao[nomes[1]] = matriz_b.ravel()
+    comparacao['Diferença'] = comparacao[nomes[1]] - comparacao[nomes[0]]
+    mantidos = (comparacao[nomes[0]] != 0) | (comparacao[nomes[1]] != 0)
+    return comparacao[mantidos].reset_index(drop=True)
@@ -0,0 +1,390 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, suppress
+from itertools import islice
+
+import openpyxl
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Diretório onde ficam as cópias colunares (Parquet) das planilhas
+DIRETORIO_CACHE = os.environ.get('SMRH_CACHE_DIR', '.cache_dados')
+
+# Colunas de dimensão sempre armazenadas como categorias (códigos inteiros + tabela de valores)
+COLUNAS_CATEGORICAS = ['Secretaria', 'Cargo', 'Descrição_Cargo', 'Cod_Cargo']
+
+# Demais colunas de texto viram categoria quando a proporção de valores distintos não passa deste limite
+LIMITE_CATEGORIA = 0.5
+
+# Versão da representação gravada em Parquet; alterar invalida as cópias existentes
+VERSAO_FORMATO = 4
+
+# Quantidade de linhas convertidas por vez na leitura em blocos
+TAMANHO_BLOCO = 50_000
+
+# Diretório dos agregados das planilhas enviadas pelas páginas, identificadas pelo hash do conteúdo
+DIRETORIO_ENVIOS = os.path.join(DIRETORIO_CACHE, 'envios')
+
+# Quantidade de processos usados na leitura de várias planilhas (padrão: número de núcleos)
+PROCESSOS = int(os.environ.get('SMRH_PROCESSOS', 0)) or None
+
+# Arquivo de trava das gravações compartilhadas do diretório de cache (índice e armazenamento de horas extras)
+ARQUIVO_TRAVA = os.path.join(DIRETORIO_CACHE, 'armazenamento.lock')
+
+# Trava das gravações entre as sessões (threads) do processo
+_trava = threading.Lock()
+
+
+# Função para obter acesso exclusivo às gravações compartilhadas do cache (uso: `with trava_armazenamento():`).
+# A trava do processo serializa as sessões; a trava do arquivo, os demais processos (ex.: relatorios.py).
+@contextmanager
+def trava_armazenamento():
+    os.makedirs(os.path.dirname(ARQUIVO_TRAVA) or '.', exist_ok=True)
+    with _trava, open(ARQUIVO_TRAVA, 'a+b') as arquivo:
+        if fcntl is not None:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+        else:
+            arquivo.seek(0)
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+            else:
+                arquivo.seek(0)
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Função para obter um arquivo temporário exclusivo no diretório de `caminho`, a ser renomeado para
+# `caminho` ao fim da gravação; cada gravação tem o seu, mesmo entre processos
+def _temporario(caminho):
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho) or '.', suffix='.tmp')
+    os.close(descritor)
+    return temporario
+
+
+# Função para gravar um DataFrame em Parquet em um arquivo temporário exclusivo e renomeá-lo,
+# para não deixar cópias parciais nem misturar gravações simultâneas do mesmo arquivo
+def gravar_parquet(df, caminho):
+    temporario = _temporario(caminho)
+    try:
+        df.to_parquet(temporario, index=False)
+        os.replace(temporario, caminho)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(temporario)
+        raise
+
+
+# Função para calcular o hash do conteúdo de um arquivo, lendo em blocos
+def calcular_hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+# Função para ler o índice que associa cada planilha ao seu último hash conhecido
+def _ler_indice():
+    caminho_indice = os.path.join(DIRETORIO_CACHE, 'indice.json')
+    if not os.path.exists(caminho_indice):
+        return {}
+    try:
+        with open(caminho_indice, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return {}
+
+
+def _gravar_indice(indice):
+    caminho_indice = os.path.join(DIRETORIO_CACHE, 'indice.json')
+    temporario = _temporario(caminho_indice)
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(indice, arquivo, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho_indice)
+
+
+# Função para obter a impressão digital (hash + mtime) da planilha.
+# O hash só é recalculado quando o mtime ou o tamanho do arquivo mudam.
+def impressao_digital(caminho):
+    estado = os.stat(caminho)
+    chave = os.path.abspath(caminho)
+    indice = _ler_indice()
+    registro = indice.get(chave)
+    if registro and registro['mtime_ns'] == estado.st_mtime_ns and registro['tamanho'] == estado.st_size:
+        return registro['hash'], estado.st_mtime_ns
+    return calcular_hash_arquivo(caminho), estado.st_mtime_ns
+
+
+# Função para converter as colunas para a representação compacta:
+# dimensões de texto como categorias (códigos int8/int16 apontando para a tabela de valores)
+# e inteiros com o menor tipo que comporta os valores (ex.: Ano em int16, Mes em int8).
+def otimizar_tipos(df):
+    df = df.copy()
+    for coluna in df.columns:
+        serie = df[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(serie.dtype):
+            # Tipos com sinal, para que diferenças entre anos ou quantidades não estourem
+            df[coluna] = pd.to_numeric(serie, downcast='integer')
+        elif pd.api.types.is_object_dtype(serie.dtype) or pd.api.types.is_string_dtype(serie.dtype):
+            if coluna in COLUNAS_CATEGORICAS or serie.nunique() <= LIMITE_CATEGORIA * len(serie):
+                df[coluna] = serie.astype('category')
+    return df
+
+
+# Função para obter os códigos inteiros de uma coluna de dimensão e a tabela de valores ordenada.
+# Para colunas categóricas os códigos já existentes são reaproveitados, sem comparar textos.
+# Valores ausentes recebem o código -1.
+def codificar(serie):
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype('category')
+    if not pd.api.types.is_string_dtype(serie.cat.categories):
+        serie = serie.cat.rename_categories(serie.cat.categories.astype(str))
+    serie = serie.cat.remove_unused_categories()
+    if not serie.cat.categories.is_monotonic_increasing:
+        serie = serie.cat.reorder_categories(serie.cat.categories.sort_values())
+    return serie.cat.codes.to_numpy(), serie.cat.categories
+
+
+# Função para concatenar DataFrames preservando as colunas categóricas.
+# As categorias de cada coluna são unificadas antes, evitando que o pandas volte para texto.
+def concatenar(dfs):
+    dfs = [df for df in dfs]
+    if not dfs:
+        return pd.DataFrame()
+    for coluna in dfs[0].columns:
+        series = [df[coluna] for df in dfs]
+        if all(isinstance(serie.dtype, pd.CategoricalDtype) for serie in series):
+            categorias = union_categoricals(series, sort_categories=True, ignore_order=True).categories
+            dfs = [df.assign(**{coluna: df[coluna].cat.set_categories(categorias)}) for df in dfs]
+    return pd.concat(dfs, ignore_index=True)
+
+
+# Função para carregar a aba de uma planilha usando a cópia em Parquet quando disponível.
+# Na primeira leitura a aba é convertida e gravada; nas seguintes o Parquet é lido direto.
+# Se a planilha mudar (hash ou mtime diferentes), a cópia é reconstruída automaticamente.
+def carregar_base(caminho, sheet_name='base'):
+    df, registro = _carregar_base(caminho, sheet_name)
+    if registro is not None:
+        _registrar_no_indice([(caminho, registro)])
+    return df
+
+
+# Função que faz o trabalho de carregar_base sem alterar o índice; quando a aba é convertida,
+# retorna também o registro a gravar no índice (assim vários processos não disputam o arquivo).
+# O conteúdo de um arquivo enviado (bytes) não tem caminho: a cópia é identificada pelo hash dos bytes.
+def _carregar_base(caminho, sheet_name='base'):
+    if isinstance(caminho, bytes):
+        return _carregar_conteudo(caminho, sheet_name), None
+
+    os.makedirs(DIRETORIO_CACHE, exist_ok=True)
+    hash_arquivo, mtime_ns = impressao_digital(caminho)
+    # O nome da cópia inclui um hash curto do caminho absoluto, para que planilhas de mesmo nome em
+    # diretórios diferentes tenham cópias próprias
+    nome_base = os.path.splitext(os.path.basename(caminho))[0]
+    hash_caminho = hashlib.sha256(os.path.abspath(caminho).encode('utf-8')).hexdigest()[:8]
+    prefixo = f"{nome_base}_{hash_caminho}_{sheet_name}_"
+    arquivo_cache = os.path.join(DIRETORIO_CACHE, f"{prefixo}{hash_arquivo[:16]}_{mtime_ns}_v{VERSAO_FORMATO}.parquet")
+
+    if os.path.exists(arquivo_cache):
+        return pd.read_parquet(arquivo_cache), None
+
+    df = otimizar_tipos(pd.read_excel(caminho, sheet_name=sheet_name))
+
+    gravar_parquet(df, arquivo_cache)
+
+    # Remover cópias antigas da mesma planilha/aba (outro processo pode tê-las removido antes)
+    for nome in os.listdir(DIRETORIO_CACHE):
+        caminho_antigo = os.path.join(DIRETORIO_CACHE, nome)
+        if nome.startswith(prefixo) and nome.endswith('.parquet') and caminho_antigo != arquivo_cache:
+            with suppress(FileNotFoundError):
+                os.remove(caminho_antigo)
+
+    estado = os.stat(caminho)
+    return df, {'hash': hash_arquivo, 'mtime_ns': estado.st_mtime_ns, 'tamanho': estado.st_size}
+
+
+# Função para carregar a aba de um arquivo enviado (bytes), usando a cópia em Parquet identificada
+# pelo hash do conteúdo. Não há planilha em disco a acompanhar, então o índice não é usado.
+def _carregar_conteudo(conteudo, sheet_name='base'):
+    hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+    arquivo_cache = os.path.join(DIRETORIO_ENVIOS, f"{hash_conteudo}_{sheet_name}_v{VERSAO_FORMATO}.parquet")
+    if os.path.exists(arquivo_cache):
+        return pd.read_parquet(arquivo_cache)
+
+    df = otimizar_tipos(pd.read_excel(io.BytesIO(conteudo), sheet_name=sheet_name))
+    os.makedirs(DIRETORIO_ENVIOS, exist_ok=True)
+    gravar_parquet(df, arquivo_cache)
+    return df
+
+
+# Função para gravar no índice os registros das planilhas convertidas. A leitura e a gravação do
+# índice são feitas sob a trava, para que sessões ou processos simultâneos não percam registros.
+def _registrar_no_indice(registros):
+    with trava_armazenamento():
+        indice = _ler_indice()
+        for caminho, registro in registros:
+            indice[os.path.abspath(caminho)] = registro
+        _gravar_indice(indice)
+
+
+# Função para normalizar as fontes de uma leitura de várias planilhas.
+# Cada fonte é um caminho, um arquivo enviado ou um par (fonte, aba); os arquivos enviados
+# são convertidos em bytes para poderem ser passados aos outros processos.
+def _normalizar_fontes(fontes, sheet_name):
+    normalizadas = []
+    for fonte in fontes:
+        arquivo, aba = fonte if isinstance(fonte, tuple) else (fonte, sheet_name)
+        if hasattr(arquivo, 'getvalue'):
+            arquivo = arquivo.getvalue()
+        elif hasattr(arquivo, 'read'):
+            arquivo = arquivo.read()
+        normalizadas.append((arquivo, aba))
+    return normalizadas
+
+
+# Função para executar `funcao` para cada tarefa (tupla de argumentos) em um pool de processos,
+# preservando a ordem das tarefas. Com uma única tarefa ou um único processo, a execução é feita
+# no próprio processo. Os processos são iniciados com 'spawn', seguro também dentro do servidor do Streamlit.
+def executar_em_paralelo(funcao, tarefas, processos=None):
+    processos = min(len(tarefas), processos or PROCESSOS or os.cpu_count() or 1)
+    if processos <= 1:
+        return [funcao(*tarefa) for tarefa in tarefas]
+    with ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(funcao, *zip(*tarefas)))
+
+
+# Função para carregar várias planilhas (ou abas) em paralelo, uma por processo, e juntar as linhas
+# em um único DataFrame com tipos compactos. Cada aba usa (e cria) a sua cópia em Parquet.
+# As fontes podem ser caminhos ou arquivos enviados; estes são identificados pelo hash do conteúdo.
+def carregar_bases(fontes, sheet_name='base', processos=None):
+    tarefas = _normalizar_fontes(fontes, sheet_name)
+    resultados = executar_em_paralelo(_carregar_base, tarefas, processos)
+    registros = [(caminho, registro) for (caminho, _), (_, registro) in zip(tarefas, resultados) if registro is not None]
+    if registros:
+        _registrar_no_indice(registros)
+    return concatenar([df for df, _ in resultados])
+
+
+# Função para ler a aba de uma planilha linha a linha (openpyxl em modo somente leitura),
+# entregando DataFrames de no máximo `tamanho_bloco` linhas já com tipos compactos.
+# Aceita um caminho ou um arquivo enviado (objeto com leitura binária).
+def ler_planilha_em_blocos(arquivo, sheet_name='base', colunas=None, tamanho_bloco=TAMANHO_BLOCO):
+    livro = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = livro[sheet_name].iter_rows(values_only=True)
+        cabecalho = list(next(linhas, ()))
+        colunas = colunas or [nome for nome in cabecalho if nome is not None]
+        ausentes = [coluna for coluna in colunas if coluna not in cabecalho]
+        if ausentes:
+            raise KeyError(f"Colunas não encontradas na aba '{sheet_name}': {', '.join(ausentes)}")
+        posicoes = [cabecalho.index(coluna) for coluna in colunas]
+
+        while True:
+            bloco = [
+                [linha[posicao] if posicao < len(linha) else None for posicao in posicoes]
+                for linha in islice(linhas, tamanho_bloco)
+            ]
+            if not bloco:
+                break
+            # Descartar linhas totalmente vazias (comuns no fim das planilhas)
+            bloco = [linha for linha in bloco if any(valor is not None for valor in linha)]
+            if bloco:
+                yield otimizar_tipos(pd.DataFrame(bloco, columns=colunas))
+    finally:
+        livro.close()
+
+
+# Função para agregar uma sequência de blocos sem manter as linhas originais em memória.
+# Cada bloco é reduzido às somas por `dimensoes` (ou à contagem de linhas, em 'Quantidade',
+# quando `valor` não é informado); os parciais são combinados periodicamente, de modo que o
+# pico de memória depende do tamanho do bloco e do agregado, e não do tamanho do arquivo.
+def agregar_em_blocos(blocos, dimensoes, valor=None, combinar_a_cada=8):
+    coluna_valor = valor or 'Quantidade'
+
+    parciais = []
+    for bloco in blocos:
+        if valor is None:
+            parciais.append(bloco.groupby(dimensoes, observed=True).size().reset_index(name=coluna_valor))
+        else:
+            parciais.append(bloco.groupby(dimensoes, observed=True, as_index=False)[valor].sum())
+        if len(parciais) >= combinar_a_cada:
+            parciais = [combinar_agregados(parciais, dimensoes, coluna_valor)]
+
+    if not parciais:
+        return pd.DataFrame(columns=dimensoes + [coluna_valor])
+    return otimizar_tipos(combinar_agregados(parciais, dimensoes, coluna_valor))
+
+
+# Função para combinar agregados parciais com as mesmas dimensões, somando `coluna_valor`
+def combinar_agregados(parciais, dimensoes, coluna_valor='Quantidade'):
+    juntos = concatenar(parciais)
+    return juntos.groupby(dimensoes, observed=True, as_index=False)[coluna_valor].sum()
+
+
+# Função executada em cada processo: lê uma planilha em blocos e devolve o seu agregado
+def _agregar_planilha(arquivo, sheet_name, colunas, dimensoes, valor, preparar):
+    if isinstance(arquivo, bytes):
+        arquivo = io.BytesIO(arquivo)
+    blocos = ler_planilha_em_blocos(arquivo, sheet_name=sheet_name, colunas=colunas)
+    if preparar is not None:
+        blocos = (preparar(bloco) for bloco in blocos)
+    return agregar_em_blocos(blocos, dimensoes, valor)
+
+
+# Função para ler e agregar várias planilhas (ou abas) em paralelo, uma por processo, combinando
+# os agregados de cada uma em um só. Cada processo devolve apenas o seu agregado, não as linhas.
+# `preparar` (opcional) é aplicado a cada bloco lido e deve ser uma função de módulo.
+def agregar_planilhas(fontes, dimensoes, valor=None, colunas=None, sheet_name='base', preparar=None, processos=None):
+    tarefas = [(arquivo, aba, colunas, dimensoes, valor, preparar) for arquivo, aba in _normalizar_fontes(fontes, sheet_name)]
+    parciais = executar_em_paralelo(_agregar_planilha, tarefas, processos)
+    parciais = [parcial for parcial in parciais if not parcial.empty]
+    if not parciais:
+        return pd.DataFrame(columns=dimensoes + [valor or 'Quantidade'])
+    return otimizar_tipos(combinar_agregados(parciais, dimensoes, valor or 'Quantidade'))
+
+
+# Função para agregar planilhas enviadas pelas páginas usando o armazenamento em disco.
+# Cada arquivo é identificado pelo hash do seu conteúdo (e pelos parâmetros da agregação): se os
+# mesmos bytes já foram enviados antes, por qualquer sessão e mesmo antes de reiniciar o servidor,
+# o agregado é lido do Parquet armazenado; os demais são lidos em paralelo e armazenados.
+def agregar_envios(arquivos, dimensoes, valor=None, colunas=None, sheet_name='base', preparar=None, processos=None):
+    coluna_valor = valor or 'Quantidade'
+    assinatura = hashlib.sha256(repr((sheet_name, colunas, dimensoes, valor, getattr(preparar, '__module__', None),
+                                      getattr(preparar, '__qualname__', None), VERSAO_FORMATO)).encode('utf-8')).hexdigest()[:12]
+
+    fontes = _normalizar_fontes(arquivos, sheet_name)
+    caminhos = [os.path.join(DIRETORIO_ENVIOS, f"{hashlib.sha256(conteudo).hexdigest()}_{assinatura}.parquet") for conteudo, _ in fontes]
+
+    # Agregar (em paralelo) apenas os arquivos ainda não armazenados
+    pendentes = [posicao for posicao, caminho in enumerate(caminhos) if not os.path.exists(caminho)]
+    tarefas = [(fontes[posicao][0], fontes[posicao][1], colunas, dimensoes, valor, preparar) for posicao in pendentes]
+    novos = dict(zip(pendentes, executar_em_paralelo(_agregar_planilha, tarefas, processos))) if tarefas else {}
+
+    os.makedirs(DIRETORIO_ENVIOS, exist_ok=True)
+    for posicao, agregado in novos.items():
+        gravar_parquet(agregado, caminhos[posicao])
+
+    parciais = [novos[posicao] if posicao in novos else pd.read_parquet(caminho) for posicao, caminho in enumerate(caminhos)]
+    parciais = [parcial for parcial in parciais if not parcial.empty]
+    if not parciais:
+        return pd.DataFrame(columns=dimensoes + [coluna_valor])
+    if len(parciais) == 1:
+        return parciais[0]
+    return otimizar_tipos(combinar_agregados(parciais, dimensoes, coluna_valor))
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+
+# Função para formatar um vetor de números no padrão brasileiro (1.234.567,89) de uma só vez.
+# Os dígitos, separadores e sinal são escritos em uma matriz de bytes (uma linha por número,
+# preenchida da direita para a esquerda) com operações vetorizadas do NumPy, sem laço por célula;
+# cada laço abaixo percorre posições de dígito, e não valores.
+def formatar_numero_br(valores, casas=2):
+    numeros = np.asarray(valores, dtype=np.float64).ravel()
+    finitos = np.isfinite(numeros)
+    escala = 10 ** casas
+    absolutos = np.rint(np.abs(np.where(finitos, numeros, 0.0)) * escala).astype(np.int64)
+    inteiros, fracoes = np.divmod(absolutos, escala)
+
+    digitos = len(str(int(inteiros.max()))) if inteiros.size else 1
+    largura = 1 + digitos + (digitos - 1) // 3 + (casas + 1 if casas else 0)
+    buffer = np.full((numeros.size, largura), ord(' '), dtype=np.uint8)
+
+    coluna = largura - 1
+    for _ in range(casas):
+        fracoes, digito = np.divmod(fracoes, 10)
+        buffer[:, coluna] = 48 + digito
+        coluna -= 1
+    if casas:
+        buffer[:, coluna] = ord(',')
+        coluna -= 1
+
+    inicio = np.full(numeros.size, coluna, dtype=np.int64)
+    restante = inteiros
+    for posicao in range(digitos):
+        ativos = (restante > 0) | (posicao == 0)
+        if posicao and posicao % 3 == 0:
+            buffer[ativos, coluna] = ord('.')
+            inicio[ativos] = coluna
+            coluna -= 1
+        restante, digito = np.divmod(restante, 10)
+        buffer[ativos, coluna] = 48 + digito[ativos]
+        inicio[ativos] = coluna
+        coluna -= 1
+
+    negativos = (numeros < 0) & finitos
+    buffer[negativos, inicio[negativos] - 1] = ord('-')
+
+    texto = np.char.lstrip(buffer.view(f'S{largura}').ravel()).astype(str).astype(object)
+    texto[np.isnan(numeros)] = 'nan'
+    texto[np.isposinf(numeros)] = 'inf'
+    texto[np.isneginf(numeros)] = '-inf'
+    return texto
+
+
+# Função para formatar, no momento da exibição, as colunas numéricas de uma tabela pequena e sem
+# paginação (ou apenas as `colunas` indicadas). A tabela original não é alterada, de modo que os
+# cálculos e caches continuam numéricos; as colunas formatadas são enviadas ao navegador como texto.
+def formatar_tabela_br(df, casas=2, colunas=None):
+    exibicao = df.copy()
+    for posicao in range(df.shape[1]):
+        serie = df.iloc[:, posicao]
+        if colunas is not None and df.columns[posicao] not in colunas:
+            continue
+        if pd.api.types.is_numeric_dtype(serie.dtype) and not pd.api.types.is_bool_dtype(serie.dtype):
+            exibicao.isetitem(posicao, formatar_numero_br(serie.to_numpy(dtype=np.float64, na_value=np.nan), casas))
+    return exibicao
+
+
+# Função para formatar a página de uma tabela paginada (tabelas.py) no padrão brasileiro por meio de
+# um Styler: apenas o texto exibido é formatado, e os valores enviados ao st.dataframe continuam
+# numéricos, de modo que a ordenação pelo cabeçalho da coluna no navegador compara números. O Styler
+# formata célula a célula e custa mais que formatar_tabela_br; a paginação limita esse custo às
+# linhas da página.
+def estilizar_tabela_br(df, casas=2, colunas=None):
+    numericas = [
+        coluna for coluna, tipo in df.dtypes.items()
+        if pd.api.types.is_numeric_dtype(tipo) and not pd.api.types.is_bool_dtype(tipo)
+        and (colunas is None or coluna in colunas)
+    ]
+    return df.style.format(precision=casas, thousands='.', decimal=',', subset=numericas)
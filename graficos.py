@@ -0,0 +1,47 @@
+import hashlib
+import io
+import json
+import os
+
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from cache_resultados import CacheResultados
+
+# Cache dos gráficos já renderizados, compartilhado por todas as sessões do processo: imagens PNG
+# (matplotlib) e figuras Plotly em JSON. As chaves seguem o formato (impressão da tabela que originou
+# o gráfico, nome do gráfico); os itens mais antigos são removidos quando a capacidade é atingida.
+cache_graficos = CacheResultados(
+    capacidade=int(os.environ.get('SMRH_CACHE_GRAFICOS', 64)),
+    ttl=float(os.environ['SMRH_CACHE_TTL']) if os.environ.get('SMRH_CACHE_TTL') else None,
+    nome='gráficos',
+)
+
+
+# Função para calcular a impressão digital de uma tabela (valores, índice e colunas)
+def impressao_tabela(df):
+    sha = hashlib.sha256()
+    sha.update(repr((list(df.columns), list(df.index.names))).encode('utf-8'))
+    sha.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return sha.hexdigest()
+
+
+# Função para obter a imagem PNG de um gráfico matplotlib, desenhando-o apenas se não estiver no cache.
+# `desenhar` retorna a figura; ela é fechada logo após a renderização, para não acumular em memória.
+def grafico_png(chave, desenhar):
+    def renderizar():
+        fig = desenhar()
+        try:
+            imagem = io.BytesIO()
+            fig.savefig(imagem, format='png', bbox_inches='tight', dpi=200)
+            return imagem.getvalue()
+        finally:
+            plt.close(fig)
+
+    return cache_graficos.obter(chave, renderizar)
+
+
+# Função para obter uma figura Plotly (como dicionário, pronto para st.plotly_chart), construindo-a
+# apenas se não estiver no cache. O cache guarda o JSON da figura; cada chamada recebe uma cópia própria.
+def grafico_plotly(chave, construir):
+    return json.loads(cache_graficos.obter(chave, lambda: construir().to_json()))
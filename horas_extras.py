@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from dados import DIRETORIO_CACHE, combinar_agregados, concatenar, otimizar_tipos, trava_armazenamento
+
+# Arquivo onde ficam os agregados mensais de horas extras já incorporados
+ARQUIVO_ROLLUP = os.path.join(DIRETORIO_CACHE, 'horas_extras_rollup.parquet')
+
+# Diretório onde ficam os agregados mensais por servidor (usados pelo índice de servidores), com um
+# arquivo Parquet por mês: uma incorporação regrava apenas os meses enviados
+DIRETORIO_SERVIDORES = os.path.join(DIRETORIO_CACHE, 'horas_extras_servidores')
+
+# Arquivo com a impressão digital do conteúdo de cada mês incorporado, para que reenviar um mês
+# idêntico ao armazenado não o regrave
+ARQUIVO_CONTEUDO_MESES = os.path.join(DIRETORIO_SERVIDORES, 'conteudo.json')
+
+# Menor granularidade usada pelas páginas; todos os demais agregados são derivados dela
+DIMENSOES_ROLLUP = ['Ano', 'Mes', 'Secretaria', 'Cod_Cargo', 'Cargo']
+
+# Granularidade por servidor: a planilha é agregada uma única vez nesse nível e o rollup é derivado dele
+DIMENSOES_SERVIDORES = ['Ano', 'Mes', 'Matricula', 'Secretaria', 'Cod_Cargo', 'Cargo']
+
+# Colunas lidas da planilha de horas extras
+COLUNAS_HORAS_EXTRAS = DIMENSOES_SERVIDORES + ['Horas_realizadas']
+
+# Matrícula atribuída às linhas sem matrícula: as suas horas continuam nos agregados por servidor
+# (e no rollup derivado deles), mas elas ficam fora do índice de servidores
+MATRICULA_AUSENTE = -1
+
+# Valores atribuídos às secretarias, códigos de cargo e cargos em branco (o código numérico, se os
+# códigos forem números): as horas dessas linhas continuam nos agregados e nos totais por secretaria
+# e por cargo
+DIMENSAO_AUSENTE = 'Não informado'
+CODIGO_AUSENTE = -1
+
+
+# Função para ajustar os tipos de um bloco de linhas lido da planilha
+def preparar_bloco(bloco):
+    # Converter a coluna 'Horas_realizadas' para numérico
+    bloco['Horas_realizadas'] = pd.to_numeric(bloco['Horas_realizadas'], errors='coerce')
+    # Garantir que as colunas 'Ano' e 'Mes' sejam tratadas como inteiros compactos
+    bloco['Ano'] = bloco['Ano'].astype('int16')
+    bloco['Mes'] = bloco['Mes'].astype('int8')
+    # Preencher as matrículas ausentes, para que o agrupamento por servidor não descarte as suas horas
+    if 'Matricula' in bloco and bloco['Matricula'].isna().any():
+        bloco['Matricula'] = preencher_matriculas(bloco['Matricula'])
+    # Preencher as secretarias, os códigos de cargo e os cargos em branco, pelo mesmo motivo
+    for coluna in ('Secretaria', 'Cod_Cargo', 'Cargo'):
+        if coluna in bloco and bloco[coluna].isna().any():
+            bloco[coluna] = preencher_dimensao(bloco[coluna])
+    return bloco
+
+
+# Função para trocar as matrículas ausentes por MATRICULA_AUSENTE (como texto, se as matrículas forem texto)
+def preencher_matriculas(matriculas):
+    matriculas = matriculas.astype(object) if isinstance(matriculas.dtype, pd.CategoricalDtype) else matriculas
+    presentes = matriculas.dropna().infer_objects()
+    if presentes.empty or pd.api.types.is_numeric_dtype(presentes.dtype):
+        return pd.to_numeric(matriculas.astype('float64').fillna(MATRICULA_AUSENTE), downcast='integer')
+    return matriculas.fillna(str(MATRICULA_AUSENTE))
+
+
+# Função para trocar os valores ausentes de uma dimensão por DIMENSAO_AUSENTE (ou por CODIGO_AUSENTE,
+# se os valores presentes forem números)
+def preencher_dimensao(valores):
+    valores = valores.astype(object) if isinstance(valores.dtype, pd.CategoricalDtype) else valores
+    presentes = valores.dropna().infer_objects()
+    if not presentes.empty and pd.api.types.is_numeric_dtype(presentes.dtype):
+        return pd.to_numeric(valores.astype('float64').fillna(CODIGO_AUSENTE), downcast='integer')
+    return valores.fillna(DIMENSAO_AUSENTE)
+
+
+# Função para criar a tabela vazia de agregados com as `dimensoes` informadas
+def _agregados_vazios(dimensoes):
+    tipos = {'Ano': 'int16', 'Mes': 'int8', 'Matricula': 'int32', 'Secretaria': 'category',
+             'Cod_Cargo': 'category', 'Cargo': 'category', 'Horas_realizadas': 'float64'}
+    colunas = dimensoes + ['Horas_realizadas']
+    return pd.DataFrame(columns=colunas).astype({coluna: tipos[coluna] for coluna in colunas})
+
+
+# Função para carregar os agregados já armazenados (DataFrame vazio se ainda não houver nenhum)
+def carregar_rollup(caminho=None):
+    caminho = caminho or ARQUIVO_ROLLUP
+    if not os.path.exists(caminho):
+        return _agregados_vazios(DIMENSOES_ROLLUP)
+    return pd.read_parquet(caminho)
+
+
+# Função para listar os arquivos mensais dos agregados por servidor, em ordem de (Ano, Mes)
+def _arquivos_servidores():
+    if not os.path.isdir(DIRETORIO_SERVIDORES):
+        return []
+    return [os.path.join(DIRETORIO_SERVIDORES, nome) for nome in sorted(os.listdir(DIRETORIO_SERVIDORES))
+            if nome.endswith('.parquet')]
+
+
+# Função para carregar os agregados mensais por servidor já armazenados (todos os meses)
+def carregar_servidores():
+    arquivos = _arquivos_servidores()
+    if not arquivos:
+        return _agregados_vazios(DIMENSOES_SERVIDORES)
+    return otimizar_tipos(concatenar([pd.read_parquet(arquivo) for arquivo in arquivos]))
+
+
+# Função para derivar o rollup (sem a matrícula) dos agregados mensais por servidor
+def resumir_servidores(servidores):
+    if servidores.empty:
+        return servidores[DIMENSOES_ROLLUP + ['Horas_realizadas']]
+    return otimizar_tipos(combinar_agregados([servidores], DIMENSOES_ROLLUP, 'Horas_realizadas'))
+
+
+# Função para obter a impressão digital dos agregados armazenados (muda a cada incorporação)
+def impressao_rollup(caminho=None):
+    caminho = caminho or ARQUIVO_ROLLUP
+    if not os.path.exists(caminho):
+        return 'vazio'
+    estado = os.stat(caminho)
+    return f"{estado.st_mtime_ns}-{estado.st_size}"
+
+
+# Função para obter a impressão digital dos agregados por servidor (muda quando algum mês é regravado)
+def impressao_servidores():
+    arquivos = _arquivos_servidores()
+    if not arquivos:
+        return 'vazio'
+    sha = hashlib.sha256()
+    for arquivo in arquivos:
+        estado = os.stat(arquivo)
+        sha.update(f"{os.path.basename(arquivo)}-{estado.st_mtime_ns}-{estado.st_size};".encode('utf-8'))
+    return sha.hexdigest()[:32]
+
+
+# Função para incorporar novos meses ao rollup armazenado.
+# Os meses presentes em `novos` substituem os já armazenados (permitindo reenviar um mês corrigido);
+# os demais meses são preservados. O custo depende apenas do tamanho dos meses enviados.
+# Deve ser chamada sob a trava do armazenamento (por incorporar_servidores), para que duas
+# incorporações simultâneas não percam os meses uma da outra.
+def _incorporar_meses(novos, caminho=None):
+    caminho = caminho or ARQUIVO_ROLLUP
+    rollup = carregar_rollup(caminho)
+
+    periodos_novos = pd.MultiIndex.from_frame(novos[['Ano', 'Mes']].drop_duplicates())
+    periodos_existentes = pd.MultiIndex.from_frame(rollup[['Ano', 'Mes']])
+    rollup = rollup[~periodos_existentes.isin(periodos_novos)]
+
+    rollup = otimizar_tipos(concatenar([rollup, otimizar_tipos(novos)])).sort_values(DIMENSOES_ROLLUP, ignore_index=True)
+
+    # Gravar em arquivo temporário e renomear, para não deixar o armazenamento parcial
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    temporario = caminho + '.tmp'
+    rollup.to_parquet(temporario, index=False)
+    os.replace(temporario, caminho)
+    return rollup
+
+
+# Função para ler a impressão digital do conteúdo de cada mês incorporado ({'AAAA_MM': hash})
+def _ler_conteudo_meses():
+    if not os.path.exists(ARQUIVO_CONTEUDO_MESES):
+        return {}
+    with open(ARQUIVO_CONTEUDO_MESES, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+# Função para calcular a impressão digital do conteúdo de um mês (já ordenado)
+def _impressao_mes(mes_df):
+    return hashlib.sha256(pd.util.hash_pandas_object(mes_df, index=False).to_numpy().tobytes()).hexdigest()
+
+
+# Função para incorporar os agregados por servidor de novos meses e o rollup derivado deles.
+# Cada mês enviado é gravado no seu próprio arquivo (substituindo o anterior, se houver); os demais
+# meses não são lidos nem regravados. Meses cujo conteúdo é idêntico ao último incorporado são
+# ignorados, de modo que incorporar o mesmo envio várias vezes não altera o armazenamento.
+# As gravações são feitas sob a mesma trava; o rollup é gravado depois dos meses por servidor e a
+# impressão digital por último, de modo que uma incorporação interrompida é refeita no próximo envio.
+# Retorna o rollup atualizado.
+def incorporar_servidores(servidores):
+    with trava_armazenamento():
+        os.makedirs(DIRETORIO_SERVIDORES, exist_ok=True)
+        conteudo = _ler_conteudo_meses()
+        alterados = []
+        for (ano, mes), mes_df in otimizar_tipos(servidores).groupby(['Ano', 'Mes'], sort=True):
+            mes_df = mes_df.assign(**{coluna: mes_df[coluna].cat.remove_unused_categories() for coluna in mes_df.columns
+                                      if isinstance(mes_df[coluna].dtype, pd.CategoricalDtype)})
+            mes_df = mes_df.sort_values(DIMENSOES_SERVIDORES, ignore_index=True)
+            chave = f"{int(ano)}_{int(mes):02d}"
+            caminho = os.path.join(DIRETORIO_SERVIDORES, f"{chave}.parquet")
+            impressao = _impressao_mes(mes_df)
+            if conteudo.get(chave) == impressao and os.path.exists(caminho):
+                continue
+            temporario = caminho + '.tmp'
+            mes_df.to_parquet(temporario, index=False)
+            os.replace(temporario, caminho)
+            conteudo[chave] = impressao
+            alterados.append(mes_df)
+
+        if not alterados:
+            return carregar_rollup()
+        rollup = _incorporar_meses(resumir_servidores(concatenar(alterados)))
+
+        temporario = ARQUIVO_CONTEUDO_MESES + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(conteudo, arquivo, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(temporario, ARQUIVO_CONTEUDO_MESES)
+        return rollup
+
+
+# Função para listar os meses (Ano, Mes) já armazenados
+def meses_armazenados(rollup):
+    return list(rollup[['Ano', 'Mes']].drop_duplicates().sort_values(['Ano', 'Mes']).itertuples(index=False, name=None))
+
+
+# Função para filtrar os agregados por intervalo de anos e secretarias (None = sem filtro)
+def filtrar_rollup(rollup, ano_inicial=None, ano_final=None, secretarias=None):
+    mascara = pd.Series(True, index=rollup.index)
+    if ano_inicial is not None:
+        mascara &= rollup['Ano'] >= ano_inicial
+    if ano_final is not None:
+        mascara &= rollup['Ano'] <= ano_final
+    if secretarias is not None:
+        mascara &= rollup['Secretaria'].isin(secretarias)
+    return rollup[mascara]
+
+
+# Horas realizadas por ano (colunas) de cada linha de `indice` (ex.: 'Secretaria' ou ['Cargo', 'Cod_Cargo']),
+# em todos os anos armazenados e opcionalmente restritas a algumas secretarias. Não depende do intervalo
+# de anos; as combinações sem registros ficam vazias (NaN), para distinguir a ausência de registros de zero.
+def horas_anuais(rollup, indice, secretarias=None):
+    filtrado = filtrar_rollup(rollup, secretarias=secretarias)
+    return filtrado.pivot_table(values='Horas_realizadas', index=indice, columns='Ano', aggfunc='sum', observed=True)
+
+
+# Função para recortar o intervalo de anos de uma tabela de horas_anuais: mantém os anos do intervalo e
+# as linhas com registros neles, com zero nas combinações sem registros (como o pivô do intervalo filtrado)
+def janela_anos(anuais, ano_inicial=None, ano_final=None):
+    anos = anuais.columns.to_numpy()
+    colunas = np.ones(len(anos), dtype=bool)
+    if ano_inicial is not None:
+        colunas &= anos >= ano_inicial
+    if ano_final is not None:
+        colunas &= anos <= ano_final
+    janela = anuais.loc[:, colunas]
+    return janela[janela.notna().any(axis=1).to_numpy()].fillna(0)
+
+
+# Horas realizadas por (Ano, Mes) para um cargo
+def horas_por_mes(rollup, cargo):
+    filtrado = rollup[rollup['Cargo'] == cargo]
+    return filtrado.groupby(['Ano', 'Mes'], observed=True, as_index=False)['Horas_realizadas'].sum()
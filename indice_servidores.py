@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+from dados import codificar
+from horas_extras import MATRICULA_AUSENTE
+
+
+# Índice das horas extras por servidor (Matricula), construído a partir dos agregados mensais por
+# servidor. As linhas ficam ordenadas por (Matricula, Ano, Mes), com o deslocamento do início de cada
+# matrícula, e há uma segunda ordenação por cargo com os seus deslocamentos. Assim o histórico de um
+# servidor e o ranking de um cargo leem apenas as suas linhas, sem percorrer a tabela inteira.
+class IndiceServidores:
+    def __init__(self, matriculas, secretarias, cargos, colunas, inicio_matricula, ordem_cargo, inicio_cargo):
+        self.matriculas = matriculas              # pd.Index com as matrículas (ordenadas)
+        self.secretarias = secretarias            # pd.Index com os nomes das secretarias (ordenados)
+        self.cargos = cargos                      # pd.MultiIndex (Cod_Cargo, Cargo) (ordenado)
+        self.colunas = colunas                    # dict de np.ndarray na ordem (Matricula, Ano, Mes)
+        self.inicio_matricula = inicio_matricula  # início das linhas de cada matrícula (+ total de linhas)
+        self.ordem_cargo = ordem_cargo            # posições das linhas ordenadas por cargo
+        self.inicio_cargo = inicio_cargo          # início das linhas de cada cargo em ordem_cargo
+
+    # Função para obter as posições de um cargo pelo par (Cod_Cargo, Cargo) ou pelo nome; um mesmo
+    # nome pode ter vários códigos, e nesse caso todos os pares com o nome são considerados
+    def _posicoes_cargo(self, cargo):
+        if isinstance(cargo, tuple):
+            return np.array([self.cargos.get_loc(cargo)])
+        return np.flatnonzero(self.cargos.get_level_values('Cargo') == cargo)
+
+    # Função para obter as linhas (posições) que atendem aos filtros. Com um cargo informado, apenas
+    # as linhas desse cargo são examinadas; as demais condições são aplicadas sobre elas.
+    # As linhas são retornadas em ordem de (Matricula, Ano, Mes).
+    def _linhas(self, secretarias=None, cargo=None, ano_inicial=None, ano_final=None):
+        if cargo is not None:
+            linhas = np.sort(np.concatenate([np.array([], dtype=self.ordem_cargo.dtype)] + [
+                self.ordem_cargo[self.inicio_cargo[posicao]:self.inicio_cargo[posicao + 1]]
+                for posicao in self._posicoes_cargo(cargo)
+            ]))
+        else:
+            linhas = np.arange(len(self.colunas['Ano']))
+        mascara = np.ones(len(linhas), dtype=bool)
+        if ano_inicial is not None:
+            mascara &= self.colunas['Ano'][linhas] >= ano_inicial
+        if ano_final is not None:
+            mascara &= self.colunas['Ano'][linhas] <= ano_final
+        if secretarias is not None:
+            codigos = self.secretarias.get_indexer(list(secretarias))
+            mascara &= np.isin(self.colunas['Secretaria'][linhas], codigos[codigos >= 0])
+        return linhas[mascara]
+
+    # Função para montar a tabela das linhas pedidas, com os nomes no lugar dos códigos
+    def _montar_tabela(self, linhas):
+        colunas = self.colunas
+        return pd.DataFrame({
+            'Matricula': self.matriculas[colunas['Matricula'][linhas]],
+            'Ano': colunas['Ano'][linhas],
+            'Mes': colunas['Mes'][linhas],
+            'Secretaria': self.secretarias[colunas['Secretaria'][linhas]],
+            'Cod_Cargo': self.cargos.get_level_values('Cod_Cargo')[colunas['Cargo'][linhas]],
+            'Cargo': self.cargos.get_level_values('Cargo')[colunas['Cargo'][linhas]],
+            'Horas_realizadas': colunas['Horas_realizadas'][linhas],
+        })
+
+    # Histórico mensal de um servidor, em ordem de (Ano, Mes); vazio se a matrícula não existir
+    def historico(self, matricula):
+        posicao = self.matriculas.get_indexer([matricula])[0]
+        if posicao < 0:
+            return self._montar_tabela(np.array([], dtype=np.int64))
+        return self._montar_tabela(np.arange(self.inicio_matricula[posicao], self.inicio_matricula[posicao + 1]))
+
+    # Ranking dos `k` servidores com mais horas extras nos filtros informados (None = sem filtro).
+    # Os k maiores totais são escolhidos por seleção parcial (argpartition) e apenas eles são ordenados.
+    # Cada servidor aparece com a secretaria e o cargo do seu último mês no filtro, o percentual das
+    # horas do filtro e o escore z do seu total em relação aos demais servidores do filtro.
+    def ranking(self, k=10, secretarias=None, cargo=None, ano_inicial=None, ano_final=None):
+        linhas = self._linhas(secretarias, cargo, ano_inicial, ano_final)
+        codigos = self.colunas['Matricula'][linhas]
+        horas = self.colunas['Horas_realizadas'][linhas]
+        totais = np.bincount(codigos, weights=horas, minlength=len(self.matriculas))
+
+        candidatos = np.flatnonzero(np.bincount(codigos, minlength=len(self.matriculas)))
+        k = min(k, len(candidatos))
+        if k == 0:
+            return pd.DataFrame(columns=['Matricula', 'Secretaria', 'Cod_Cargo', 'Cargo', 'Horas_realizadas',
+                                         'Participação', 'Escore_Z'])
+        escolhidos = candidatos[np.argpartition(-totais[candidatos], k - 1)[:k]]
+        escolhidos = escolhidos[np.argsort(-totais[escolhidos], kind='stable')]
+
+        # As linhas filtradas estão em ordem de (Matricula, Ano, Mes), então a última linha de cada
+        # servidor antes do início da matrícula seguinte é o seu último mês
+        ultimas = linhas[np.searchsorted(linhas, self.inicio_matricula[escolhidos + 1], side='left') - 1]
+
+        tabela = self._montar_tabela(ultimas).drop(columns=['Ano', 'Mes'])
+        tabela['Horas_realizadas'] = totais[escolhidos]
+        tabela['Participação'] = totais[escolhidos] / horas.sum() * 100
+        desvio = totais[candidatos].std()
+        tabela['Escore_Z'] = (totais[escolhidos] - totais[candidatos].mean()) / desvio if desvio > 0 else 0.0
+        return tabela
+
+
+# Função para construir o índice a partir dos agregados mensais por servidor
+# (colunas Ano, Mes, Matricula, Secretaria, Cod_Cargo, Cargo e Horas_realizadas).
+# As linhas sem matrícula (MATRICULA_AUSENTE) não pertencem a nenhum servidor e ficam de fora.
+def construir_indice(servidores_df):
+    servidores_df = servidores_df.dropna(subset=['Matricula', 'Secretaria', 'Cod_Cargo', 'Cargo'])
+    servidores_df = servidores_df[~servidores_df['Matricula'].isin([MATRICULA_AUSENTE, str(MATRICULA_AUSENTE)])]
+
+    codigos_matricula, matriculas = pd.factorize(servidores_df['Matricula'], sort=True)
+    codigos_secretaria, secretarias = codificar(servidores_df['Secretaria'])
+    codigos_codigo, codigos = codificar(servidores_df['Cod_Cargo'])
+    codigos_nome, nomes = codificar(servidores_df['Cargo'])
+
+    # Cada cargo é um par (Cod_Cargo, Cargo); combinar os dois códigos em um único inteiro
+    par = codigos_codigo.astype(np.int64) * len(nomes) + codigos_nome
+    codigos_cargo, pares = pd.factorize(par, sort=True)
+    cargos = pd.MultiIndex.from_arrays([codigos[pares // len(nomes)], nomes[pares % len(nomes)]],
+                                       names=['Cod_Cargo', 'Cargo'])
+
+    anos = servidores_df['Ano'].to_numpy(dtype=np.int16)
+    meses = servidores_df['Mes'].to_numpy(dtype=np.int8)
+    ordem = np.lexsort((meses, anos, codigos_matricula))
+    colunas = {
+        'Matricula': codigos_matricula[ordem],
+        'Ano': anos[ordem],
+        'Mes': meses[ordem],
+        'Secretaria': codigos_secretaria[ordem],
+        'Cargo': codigos_cargo[ordem],
+        'Horas_realizadas': servidores_df['Horas_realizadas'].to_numpy(dtype=np.float64)[ordem],
+    }
+
+    inicio_matricula = np.searchsorted(colunas['Matricula'], np.arange(len(matriculas) + 1))
+    ordem_cargo = np.argsort(colunas['Cargo'], kind='stable')
+    inicio_cargo = np.searchsorted(colunas['Cargo'][ordem_cargo], np.arange(len(cargos) + 1))
+
+    return IndiceServidores(
+        pd.Index(matriculas, name='Matricula'),
+        pd.Index(secretarias, name='Secretaria'),
+        cargos,
+        colunas,
+        inicio_matricula,
+        ordem_cargo,
+        inicio_cargo,
+    )
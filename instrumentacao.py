@@ -0,0 +1,119 @@
+import contextvars
+import json
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from cache_resultados import CACHES
+from dados import DIRETORIO_CACHE
+
+# Instrumentação opcional das páginas: tempo e memória de cada etapa nomeada de uma execução
+# (rerun) e acertos/falhas dos caches. Ativada com SMRH_INSTRUMENTACAO=1; cada execução é gravada
+# como uma linha JSON em SMRH_LOG_DESEMPENHO e exibida em um painel na barra lateral.
+# Desativada, `etapa` não faz nada além de executar o bloco.
+ATIVA = os.environ.get('SMRH_INSTRUMENTACAO', '') not in ('', '0')
+ARQUIVO_LOG = os.environ.get('SMRH_LOG_DESEMPENHO', os.path.join(DIRETORIO_CACHE, 'desempenho.jsonl'))
+
+_execucao = contextvars.ContextVar('execucao', default=None)
+_logger = logging.getLogger('smrh.desempenho')
+
+
+# Função para configurar o log JSON (uma execução por linha), apenas uma vez por processo
+def _configurar_log():
+    if _logger.handlers:
+        return
+    os.makedirs(os.path.dirname(ARQUIVO_LOG) or '.', exist_ok=True)
+    handler = logging.FileHandler(ARQUIVO_LOG, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    _logger.addHandler(handler)
+    _logger.setLevel(logging.INFO)
+    _logger.propagate = False
+
+
+# Função para obter os contadores atuais de todos os caches registrados
+def _contadores_caches():
+    return {nome: (cache.acertos, cache.falhas) for nome, cache in CACHES.items()}
+
+
+# Função para iniciar a medição de uma execução da página (chamada no início do script)
+def iniciar_execucao(pagina):
+    if not ATIVA:
+        return
+    _configurar_log()
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _execucao.set({
+        'pagina': pagina,
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'relogio': time.perf_counter(),
+        'etapas': [],
+        'caches': _contadores_caches(),
+    })
+
+
+# Função para medir uma etapa nomeada da execução atual (uso: `with etapa('nome'):`).
+# A memória é medida com o tracemalloc: variação ao fim da etapa e pico durante a etapa,
+# ambos relativos ao início. Com várias sessões simultâneas o pico pode incluir outras execuções.
+@contextmanager
+def etapa(nome):
+    execucao = _execucao.get()
+    if execucao is None:
+        yield
+        return
+
+    memoria_inicial, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        memoria_final, pico = tracemalloc.get_traced_memory()
+        execucao['etapas'].append({
+            'etapa': nome,
+            'duracao_ms': round(duracao * 1000, 3),
+            'memoria_delta_kb': round((memoria_final - memoria_inicial) / 1024, 1),
+            'memoria_pico_kb': round((pico - memoria_inicial) / 1024, 1),
+        })
+
+
+# Função para encerrar a medição da execução atual: grava o registro no log JSON e o retorna
+# (None se a instrumentação estiver desativada)
+def finalizar_execucao():
+    execucao = _execucao.get()
+    if execucao is None:
+        return None
+    _execucao.set(None)
+
+    contadores = _contadores_caches()
+    registro = {
+        'data': execucao['data'],
+        'pagina': execucao['pagina'],
+        'duracao_total_ms': round((time.perf_counter() - execucao['relogio']) * 1000, 3),
+        'etapas': execucao['etapas'],
+        'caches': {
+            nome: {
+                'acertos': acertos - execucao['caches'].get(nome, (0, 0))[0],
+                'falhas': falhas - execucao['caches'].get(nome, (0, 0))[1],
+            }
+            for nome, (acertos, falhas) in contadores.items()
+        },
+    }
+    _logger.info(json.dumps(registro, ensure_ascii=False))
+    return registro
+
+
+# Função para exibir na barra lateral o detalhamento da execução encerrada
+def exibir_painel(registro):
+    if registro is None:
+        return
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander(f"Desempenho: {registro['duracao_total_ms']:.0f} ms"):
+        if registro['etapas']:
+            st.dataframe(pd.DataFrame(registro['etapas']).set_index('etapa'), use_container_width=True)
+        for nome, contadores in registro['caches'].items():
+            st.caption(f"Cache de {nome}: {contadores['acertos']} acertos, {contadores['falhas']} falhas nesta execução")
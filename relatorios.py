@@ -0,0 +1,146 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+from analise import (analise_geral_horas, detalhamentos_secretarias, extratos_mensais, panoramas_secretarias,
+                     variacao_oscilacao)
+from bases import BASES_SERVIDORES, obter_cubo
+from cubo import construir_cubo
+from dados import agregar_planilhas, carregar_bases
+from horas_extras import COLUNAS_HORAS_EXTRAS, DIMENSOES_ROLLUP, carregar_rollup, preparar_bloco
+
+# Gera em lote, sem o Streamlit, as tabelas das páginas para todas as secretarias e cargos.
+# Exemplos:
+#   python relatorios.py servidores --base base.xlsx --formato xlsx --saida relatorios
+#   python relatorios.py horas-extras --ano-inicial 2023 --formato csv --saida relatorios
+
+FORMATOS = ['csv', 'xlsx', 'parquet']
+
+
+# Função para transformar o nome de uma secretaria ou cargo em um nome de arquivo válido.
+# Nomes diferentes que resultariam no mesmo arquivo (também sem distinguir maiúsculas, como no
+# Windows) recebem um sufixo numérico; `usados` guarda os nomes já atribuídos no mesmo diretório.
+def nome_arquivo(nome, usados):
+    base = re.sub(r'[^\w\-]+', '_', str(nome)).strip('_') or 'sem_nome'
+    candidato, sufixo = base, 1
+    while candidato.casefold() in usados:
+        sufixo += 1
+        candidato = f"{base}_{sufixo}"
+    usados.add(candidato.casefold())
+    return candidato
+
+
+# Função para preparar uma tabela para exportação: índices com significado (Secretaria, Cargo)
+# viram colunas e os nomes das colunas (anos) passam a ser texto
+def normalizar_tabela(tabela):
+    if not isinstance(tabela.index, pd.RangeIndex):
+        tabela = tabela.reset_index()
+    return tabela.set_axis([str(coluna) for coluna in tabela.columns], axis=1)
+
+
+# Função para gravar uma tabela no formato escolhido (normalizada por normalizar_tabela).
+# O CSV segue o padrão brasileiro do Excel: separador ';' e vírgula decimal.
+def gravar_tabela(tabela, caminho, formato):
+    tabela = normalizar_tabela(tabela)
+
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    caminho = f"{caminho}.{formato}"
+    if formato == 'csv':
+        tabela.to_csv(caminho, sep=';', decimal=',', index=False, encoding='utf-8-sig')
+    elif formato == 'xlsx':
+        tabela.to_excel(caminho, index=False)
+    else:
+        tabela.to_parquet(caminho, index=False)
+    return caminho
+
+
+# Função para carregar o cubo de uma base registrada (pelo nome) ou de uma ou mais planilhas,
+# lidas em paralelo e combinadas
+def carregar_cubo_servidores(bases, aba, processos=None):
+    if len(bases) == 1 and bases[0] in BASES_SERVIDORES:
+        return obter_cubo(bases[0])
+    return construir_cubo(carregar_bases(bases, sheet_name=aba, processos=processos))
+
+
+# Função para carregar os agregados de horas extras: das planilhas, se informadas (lidas em paralelo),
+# ou dos meses armazenados
+def carregar_horas_extras(planilhas, aba, processos=None):
+    if not planilhas:
+        return carregar_rollup()
+    return agregar_planilhas(planilhas, DIMENSOES_ROLLUP, 'Horas_realizadas', colunas=COLUNAS_HORAS_EXTRAS,
+                             sheet_name=aba, preparar=preparar_bloco, processos=processos)
+
+
+# Relatórios da base de servidores: quadros gerais por secretaria e por cargo e o quadro funcional de cada secretaria
+def relatorios_servidores(args):
+    cubo = carregar_cubo_servidores(args.base, args.aba, args.processos)
+    ano_inicial = args.ano_inicial or int(cubo.anos[0])
+    ano_final = args.ano_final or int(cubo.anos[-1])
+    saida = os.path.join(args.saida, 'servidores')
+
+    arquivos = [
+        gravar_tabela(variacao_oscilacao(cubo, ano_inicial, ano_final, 'Secretaria'), os.path.join(saida, 'geral_secretarias'), args.formato),
+        gravar_tabela(variacao_oscilacao(cubo, ano_inicial, ano_final, 'Cargo'), os.path.join(saida, 'geral_cargos'), args.formato),
+    ]
+    usados = set()
+    for secretaria, tabela in panoramas_secretarias(cubo, ano_inicial, ano_final):
+        arquivos.append(gravar_tabela(tabela, os.path.join(saida, 'secretarias', nome_arquivo(secretaria, usados)), args.formato))
+    return arquivos
+
+
+# Relatórios de horas extras: tabelas gerais, detalhamento de cada secretaria e extrato mensal de cada cargo
+def relatorios_horas_extras(args):
+    rollup = carregar_horas_extras(args.planilha, args.aba, args.processos)
+    if rollup.empty:
+        sys.exit("Nenhum mês de horas extras armazenado; informe uma planilha com --planilha.")
+    ano_inicial = args.ano_inicial or int(rollup['Ano'].min())
+    ano_final = args.ano_final or int(rollup['Ano'].max())
+    saida = os.path.join(args.saida, 'horas_extras')
+
+    df_secretarias_pivot, df_top_cargos_pivot, _, _ = analise_geral_horas(rollup, ano_inicial, ano_final)
+    arquivos = [
+        gravar_tabela(df_secretarias_pivot, os.path.join(saida, 'geral_secretarias'), args.formato),
+        gravar_tabela(df_top_cargos_pivot, os.path.join(saida, 'geral_cargos'), args.formato),
+    ]
+    usados = set()
+    for secretaria, tabela in detalhamentos_secretarias(rollup, ano_inicial, ano_final):
+        arquivos.append(gravar_tabela(tabela, os.path.join(saida, 'secretarias', nome_arquivo(secretaria, usados)), args.formato))
+    usados = set()
+    for cargo, tabela in extratos_mensais(rollup):
+        arquivos.append(gravar_tabela(tabela, os.path.join(saida, 'cargos', nome_arquivo(cargo, usados)), args.formato))
+    return arquivos
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Gera em lote os relatórios das páginas para todas as secretarias e cargos.')
+    subparsers = parser.add_subparsers(dest='relatorio', required=True)
+
+    servidores = subparsers.add_parser('servidores', help='quantitativos de servidores (app.py e appfile.py)')
+    servidores.add_argument('--base', nargs='+', default=['base.xlsx'],
+                            help=f"base registrada ({', '.join(BASES_SERVIDORES)}) ou caminhos de uma ou mais planilhas")
+    servidores.set_defaults(gerar=relatorios_servidores)
+
+    horas_extras = subparsers.add_parser('horas-extras', help='horas extras realizadas (apphe.py)')
+    horas_extras.add_argument('--planilha', nargs='+', help='planilhas de horas extras (padrão: meses já armazenados)')
+    horas_extras.set_defaults(gerar=relatorios_horas_extras)
+
+    for subparser in (servidores, horas_extras):
+        subparser.add_argument('--aba', default='base', help='aba da planilha')
+        subparser.add_argument('--ano-inicial', type=int)
+        subparser.add_argument('--ano-final', type=int)
+        subparser.add_argument('--formato', choices=FORMATOS, default='csv')
+        subparser.add_argument('--saida', default='relatorios', help='diretório de saída')
+        subparser.add_argument('--processos', type=int, help='processos para ler várias planilhas (padrão: número de núcleos)')
+
+    args = parser.parse_args(argumentos)
+    inicio = time.perf_counter()
+    arquivos = args.gerar(args)
+    print(f"{len(arquivos)} arquivos gravados em {os.path.abspath(args.saida)} ({time.perf_counter() - inicio:.1f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from formatacao import estilizar_tabela_br
+
+# Quantidade padrão de linhas enviadas ao navegador por página
+LINHAS_POR_PAGINA = int(os.environ.get('SMRH_LINHAS_POR_PAGINA', 50))
+
+# Opções de linhas por página oferecidas ao usuário
+OPCOES_LINHAS_POR_PAGINA = sorted({25, 50, 100, 500, LINHAS_POR_PAGINA})
+
+
+# Função para obter a máscara das linhas que contêm o texto buscado em alguma coluna de texto.
+# Nas colunas categóricas a busca é feita nas categorias e levada às linhas pelos códigos.
+def _mascara_busca(df, busca):
+    mascara = np.zeros(len(df), dtype=bool)
+    for posicao in range(df.shape[1]):
+        serie = df.iloc[:, posicao]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            encontradas = serie.cat.categories.astype(str).str.contains(busca, case=False, regex=False)
+            codigos = serie.cat.codes.to_numpy()
+            mascara |= (codigos >= 0) & np.append(encontradas, False)[codigos]
+        elif pd.api.types.is_object_dtype(serie.dtype) or pd.api.types.is_string_dtype(serie.dtype):
+            mascara |= serie.astype(str).str.contains(busca, case=False, regex=False).to_numpy()
+    return mascara
+
+
+# Função para obter a tabela usada na busca e na ordenação: os níveis nomeados do índice
+# (ex.: 'Secretaria' ou 'Cargo' das tabelas pivô) são tratados como colunas
+def _colunas_pesquisaveis(df):
+    if any(nome is not None for nome in df.index.names):
+        return df.reset_index()
+    return df
+
+
+# Função para obter as posições das linhas da tabela que contêm o texto buscado, na ordem pedida.
+# A ordenação usa os valores originais (números como números, e não o texto formatado).
+def ordenar_linhas(df, busca='', ordenar_por=None, crescente=True):
+    df = _colunas_pesquisaveis(df)
+    posicoes = np.arange(len(df))
+    if busca:
+        posicoes = posicoes[_mascara_busca(df, busca)]
+    if ordenar_por is not None:
+        serie = df.iloc[posicoes, df.columns.get_loc(ordenar_por)].reset_index(drop=True)
+        posicoes = posicoes[serie.sort_values(ascending=crescente, kind='stable', na_position='last').index.to_numpy()]
+    return posicoes
+
+
+# Função para recortar uma página (a primeira é 1) das linhas já filtradas e ordenadas
+def selecionar_pagina(df, posicoes, pagina=1, linhas_por_pagina=LINHAS_POR_PAGINA):
+    inicio = (pagina - 1) * linhas_por_pagina
+    return df.iloc[posicoes[inicio:inicio + linhas_por_pagina]]
+
+
+# Função para exibir uma tabela grande paginada: a tabela fica no servidor e apenas as linhas da página
+# atual são formatadas (padrão brasileiro), estilizadas e enviadas ao navegador. A busca e a ordenação
+# também são feitas no servidor. `chave` identifica os controles da tabela na página.
+# Com `linha_total`, a última linha da tabela (ex.: 'Total') fica fixa ao final de todas as páginas;
+# durante uma busca ela não é exibida, pois foi calculada sobre todas as linhas, e não sobre as encontradas.
+def exibir_tabela_paginada(df, chave, casas=2, colunas=None, centralizar=False, linha_total=False, altura='auto'):
+    total = df.iloc[-1:] if linha_total and len(df) else None
+    dados = df.iloc[:-1] if total is not None else df
+
+    col1, col2, col3, col4 = st.columns([3, 2, 2, 1])
+    with col1:
+        busca = st.text_input('Buscar', key=f'{chave}_busca', placeholder='Filtrar linhas pelo texto')
+    with col2:
+        ordenar_por = st.selectbox('Ordenar por', [None] + list(_colunas_pesquisaveis(dados.iloc[:0]).columns), key=f'{chave}_ordenar',
+                                   format_func=lambda coluna: '(ordem original)' if coluna is None else str(coluna))
+    with col3:
+        ordem = st.radio('Ordem', ['Crescente', 'Decrescente'], key=f'{chave}_ordem', horizontal=True)
+    with col4:
+        linhas_por_pagina = st.selectbox('Linhas', OPCOES_LINHAS_POR_PAGINA, key=f'{chave}_linhas',
+                                         index=OPCOES_LINHAS_POR_PAGINA.index(LINHAS_POR_PAGINA))
+
+    posicoes = ordenar_linhas(dados, busca, ordenar_por, ordem == 'Crescente')
+    if busca:
+        total = None
+
+    # A quantidade de páginas depende da busca; a página atual é ajustada antes de criar o controle
+    paginas = max(1, -(-len(posicoes) // linhas_por_pagina))
+    chave_pagina = f'{chave}_pagina'
+    if st.session_state.get(chave_pagina, 1) > paginas:
+        st.session_state[chave_pagina] = paginas
+    pagina = st.number_input('Página', min_value=1, max_value=paginas, key=chave_pagina) if paginas > 1 else 1
+
+    pagina_df = selecionar_pagina(dados, posicoes, pagina, linhas_por_pagina)
+    if total is not None:
+        pagina_df = pd.concat([pagina_df, total])
+
+    exibicao = estilizar_tabela_br(pagina_df, casas=casas, colunas=colunas)
+    if centralizar:
+        exibicao = exibicao.set_properties(**{'text-align': 'center'})
+    st.dataframe(exibicao, height=altura, use_container_width=True)
+
+    inicio = (pagina - 1) * linhas_por_pagina
+    st.caption(f"Página {pagina} de {paginas}: linhas {min(inicio + 1, len(posicoes))} a {min(inicio + linhas_por_pagina, len(posicoes))} de {len(posicoes)}")